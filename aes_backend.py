@@ -0,0 +1,227 @@
+'''
+Pluggable AES backends for the ECB primitive under every mode in challenge_util
+
+A backend turns a key into a cipher object with encrypt(data) and decrypt(data) for ECB on a multiple of 16 bytes
+Adapters: pycryptodome (or the PyCrypto it replaces, same API), cryptography, NumPy (aes_numpy) and pure Python (aes_pure)
+The fastest available backend is picked by a one-time micro-benchmark, and the choice is cached on disk
+(keyed by machine and Python version). AES_BACKEND=<name> in the environment overrides the choice
+
+To run: python3 aes_backend.py <Optional: retune> (reports backends, throughput and the selected one)
+'''
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Constants
+cache_filename = os.environ.get("AES_BACKEND_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "cryptopals", "aes_backend.json"))
+tune_bytes = 1 << 16 # Bulk part of the micro-benchmark
+tune_calls = 256 # Single-block calls in the micro-benchmark (most challenge calls are a block or two)
+
+#
+# Adapters
+#
+'''
+pycryptodome / PyCrypto: ECB cipher objects already have the right interface
+'''
+def pycryptodome_new():
+  from Crypto.Cipher import AES
+  return lambda key_bytes: AES.new(bytes(key_bytes), AES.MODE_ECB)
+
+'''
+cryptography: ECB contexts are streaming, and stay usable as long as each update is whole blocks
+Contexts are stateful and not safe for concurrent updates, so each thread gets its own pair
+'''
+class CryptographyECB:
+  def __init__(self, key_bytes):
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    self.cipher = Cipher(algorithms.AES(bytes(key_bytes)), modes.ECB())
+    self.local = threading.local()
+
+  # This thread's (encryptor, decryptor), built on its first call
+  def contexts(self):
+    if not hasattr(self.local, "encryptor"):
+      self.local.encryptor = self.cipher.encryptor()
+      self.local.decryptor = self.cipher.decryptor()
+    return self.local
+
+  def encrypt(self, data):
+    return self.contexts().encryptor.update(bytes(data))
+
+  def decrypt(self, data):
+    return self.contexts().decryptor.update(bytes(data))
+
+def cryptography_new():
+  import cryptography.hazmat.primitives.ciphers
+  return CryptographyECB
+
+def numpy_new():
+  from aes_numpy import AESNumpy
+  return AESNumpy
+
+def pure_new():
+  from aes_pure import AESPure
+  return AESPure
+
+# Name -> function returning the key -> cipher object constructor, raising ImportError if unavailable
+adapters = OrderedDict([
+  ("pycryptodome", pycryptodome_new),
+  ("cryptography", cryptography_new),
+  ("numpy", numpy_new),
+  ("pure", pure_new),
+])
+
+'''
+pycryptodome cipher objects can write into a caller's buffer (output = ...), the others return new bytes
+'''
+def supports_output(new):
+  try:
+    new(bytes(16)).encrypt(bytes(16), output = bytearray(16))
+    return True
+  except TypeError:
+    return False
+
+#
+# Selection
+#
+class Backend:
+  def __init__(self, name, new):
+    self.name = name
+    self.new = new # key_bytes -> cipher object
+    self.output = supports_output(new) # Whether encrypt/decrypt take output = <writable buffer>
+
+  def __repr__(self):
+    return "Backend({0})".format(self.name)
+
+'''
+Returns OrderedDict of name -> Backend for every adapter whose library imports
+'''
+def available_backends():
+  backends = OrderedDict()
+  for name, adapter in adapters.items():
+    try:
+      backends[name] = Backend(name, adapter())
+    except ImportError:
+      pass
+  return backends
+
+'''
+Micro-benchmark: one key setup, tune_calls single-block encryptions and one tune_bytes encryption
+Returns throughput in MB/s over all bytes encrypted
+'''
+def measure(backend, repeat = 3):
+  key = os.urandom(16)
+  block = os.urandom(16)
+  bulk = os.urandom(tune_bytes)
+  best = None
+  for i in range(repeat):
+    start = time.perf_counter()
+    cipher = backend.new(key)
+    for j in range(tune_calls):
+      cipher.encrypt(block)
+    cipher.encrypt(bulk)
+    elapsed = time.perf_counter() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return (16 * tune_calls + tune_bytes) / best / (1 << 20)
+
+def machine_id():
+  return "{0} {1} {2}".format(platform.node(), platform.machine(), platform.python_version())
+
+def load_tuning():
+  try:
+    with open(cache_filename) as fin:
+      return json.load(fin)
+  except (OSError, ValueError):
+    return None
+
+'''
+Writes a temporary file next to the cache and renames it into place, so processes tuning at the same time
+(e.g. pool workers started without a cache) never leave a partly written cache behind
+'''
+def save_tuning(tuning):
+  try:
+    directory = os.path.dirname(cache_filename)
+    os.makedirs(directory, exist_ok = True)
+    fd, tmp_filename = tempfile.mkstemp(dir = directory, suffix = ".tmp")
+    try:
+      with os.fdopen(fd, 'w') as fout:
+        json.dump(tuning, fout, indent = 2)
+      os.replace(tmp_filename, cache_filename)
+    except BaseException:
+      os.remove(tmp_filename)
+      raise
+  except OSError:
+    pass # Read-only home: tune again next run
+
+'''
+Measures every available backend and saves {"machine", "throughput": {name: MB/s}, "selected"}
+'''
+def tune(backends = None):
+  backends = backends or available_backends()
+  throughput = OrderedDict((name, measure(backend)) for name, backend in backends.items())
+  tuning = {"machine": machine_id(), "throughput": throughput, "selected": max(throughput, key = throughput.get)}
+  save_tuning(tuning)
+  return tuning
+
+'''
+Returns the cached tuning if it is for this machine and the same set of backends, otherwise tunes again
+'''
+def get_tuning(backends = None):
+  backends = backends or available_backends()
+  tuning = load_tuning()
+  if tuning is None or tuning.get("machine") != machine_id() or set(tuning.get("throughput", {})) != set(backends):
+    tuning = tune(backends)
+  return tuning
+
+_selected = None
+
+'''
+Returns the Backend in use: AES_BACKEND from the environment if set, otherwise the tuned choice
+'''
+def get_backend():
+  global _selected
+  if _selected is None:
+    backends = available_backends()
+    if len(backends) == 0:
+      raise ImportError("No AES backend available")
+    name = os.environ.get("AES_BACKEND")
+    if name is None:
+      name = get_tuning(backends)["selected"]
+    if name not in backends:
+      raise ValueError("AES backend {0} not available (have: {1})".format(name, ", ".join(backends)))
+    _selected = backends[name]
+  return _selected
+
+'''
+Switches to backend name (None: back to AES_BACKEND / the tuned choice)
+Callers holding cipher objects (e.g. challenge_util.cipher_cache) must drop them; see challenge_util.use_backend
+'''
+def set_backend(name):
+  global _selected
+  _selected = None
+  if name is not None:
+    backends = available_backends()
+    if name not in backends:
+      raise ValueError("AES backend {0} not available (have: {1})".format(name, ", ".join(backends)))
+    _selected = backends[name]
+  return get_backend()
+
+def report(tuning = None):
+  tuning = tuning or get_tuning()
+  for name, mbps in tuning["throughput"].items():
+    print("{0:14} | {1:10.1f} MB/s".format(name, mbps))
+  print("Tuned choice: {0} | In use: {1}".format(tuning["selected"], get_backend().name))
+  print()
+
+def main(argv):
+  tuning = tune() if len(argv) >= 2 and argv[1] == "retune" else get_tuning()
+  report(tuning)
+
+if __name__ == "__main__":
+  main(sys.argv)
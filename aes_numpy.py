@@ -0,0 +1,119 @@
+'''
+Batched AES in NumPy: T-table rounds over an N x 16 array of blocks per call (See aes_pure, aes_backend)
+
+The state is four uint32 column words per block, held as four length-N arrays, so every table lookup
+and XOR of a round runs over all N blocks at once. Round keys are either shared (one key for every block)
+or per row (one key per block, expanded in a batch too), e.g. counter blocks under many different keys
+Selectable as the "numpy" AES backend: AES_BACKEND=numpy, or challenge_util.use_backend("numpy")
+'''
+
+import numpy as np
+import aes_pure
+
+# Tables as uint32 arrays, so lookups are fancy indexing
+S = np.array(aes_pure.S, dtype = np.uint32)
+S_inv = np.array(aes_pure.S_inv, dtype = np.uint32)
+Te = [np.array(t, dtype = np.uint32) for t in [aes_pure.Te0, aes_pure.Te1, aes_pure.Te2, aes_pure.Te3]]
+Td = [np.array(t, dtype = np.uint32) for t in [aes_pure.Td0, aes_pure.Td1, aes_pure.Td2, aes_pure.Td3]]
+Rcon = np.array(aes_pure.Rcon, dtype = np.uint32)
+
+def sub_word(w):
+  return (S[w >> 24] << 24) | (S[(w >> 16) & 0xff] << 16) | (S[(w >> 8) & 0xff] << 8) | S[w & 0xff]
+
+'''
+Returns round key words for keys, an N x (16, 24 or 32) uint8 array: N x 4 (rounds + 1) uint32 array
+Same recurrence as aes_pure.expand_key, one column of words at a time over every key
+'''
+def expand_keys(keys):
+  Nk = keys.shape[1] // 4
+  if keys.shape[1] not in [16, 24, 32]:
+    raise ValueError("Incorrect AES key length ({0} bytes)".format(keys.shape[1]))
+  total = 4 * (Nk + 7)
+  words = np.empty((keys.shape[0], total), dtype = np.uint32)
+  words[:, :Nk] = np.ascontiguousarray(keys).view(">u4")
+  for i in range(Nk, total):
+    temp = words[:, i-1]
+    if i % Nk == 0:
+      temp = sub_word((temp << 8) | (temp >> 24)) ^ (Rcon[i // Nk - 1] << 24)
+    elif Nk > 6 and i % Nk == 4:
+      temp = sub_word(temp)
+    words[:, i] = words[:, i - Nk] ^ temp
+  return words
+
+'''
+Round key words of the equivalent inverse cipher for each row of expand_keys (See aes_pure.decryption_key)
+'''
+def decryption_keys(words):
+  rounds = words.shape[1] // 4 - 1
+  dk = words.reshape(words.shape[0], rounds + 1, 4)[:, ::-1, :].copy()
+  middle = dk[:, 1:rounds, :]
+  dk[:, 1:rounds, :] = (Td[0][S[middle >> 24]] ^ Td[1][S[(middle >> 16) & 0xff]] ^
+                        Td[2][S[(middle >> 8) & 0xff]] ^ Td[3][S[middle & 0xff]])
+  return dk.reshape(words.shape[0], -1)
+
+'''
+Round keys for key: bytes (shared, returned as 1 x words so it broadcasts) or an N x 16 uint8 array (one per row)
+'''
+def round_keys(key):
+  if isinstance(key, np.ndarray):
+    return expand_keys(key.astype(np.uint8, copy = False))
+  return expand_keys(np.frombuffer(bytes(key), dtype = np.uint8).reshape(1, -1))
+
+'''
+bytes (a multiple of 16) as an N x 16 uint8 array; arrays are used as they are
+'''
+def as_blocks(data):
+  if isinstance(data, np.ndarray):
+    return data
+  assert(len(data) % 16 == 0)
+  return np.frombuffer(data, dtype = np.uint8).reshape(-1, 16)
+
+'''
+Runs the rounds on blocks (N x 16 uint8) with round key words rk (1 or N rows)
+T, Sbox: Te/S for encryption, Td/S_inv for decryption. shifts gives the columns feeding each output column
+'''
+def crypt_blocks(blocks, rk, T, Sbox, shifts):
+  blocks = np.ascontiguousarray(blocks, dtype = np.uint8).reshape(-1, 16)
+  words = blocks.view(">u4").astype(np.uint32)
+  s = [words[:, c] ^ rk[:, c] for c in range(4)]
+  rounds = rk.shape[1] // 4 - 1
+  for r in range(1, rounds):
+    s = [T[0][s[c] >> 24] ^ T[1][(s[shifts[1][c]] >> 16) & 0xff] ^ T[2][(s[shifts[2][c]] >> 8) & 0xff] ^
+         T[3][s[shifts[3][c]] & 0xff] ^ rk[:, 4*r + c] for c in range(4)]
+  out = np.empty((blocks.shape[0], 4), dtype = ">u4")
+  for c in range(4):
+    out[:, c] = ((Sbox[s[c] >> 24] << 24) | (Sbox[(s[shifts[1][c]] >> 16) & 0xff] << 16) |
+                 (Sbox[(s[shifts[2][c]] >> 8) & 0xff] << 8) | Sbox[s[shifts[3][c]] & 0xff]) ^ rk[:, 4*rounds + c]
+  return out.view(np.uint8).reshape(-1, 16)
+
+# Column feeding byte row j of output column c: c + j for encryption (ShiftRows), c - j for decryption
+encrypt_shifts = [[(c + j) % 4 for c in range(4)] for j in range(4)]
+decrypt_shifts = [[(c - j) % 4 for c in range(4)] for j in range(4)]
+
+'''
+ECB encryption of blocks (N x 16 uint8 array, or bytes) under key: bytes (shared) or N x 16 uint8 array (one key per row)
+Returns N x 16 uint8 array
+'''
+def encrypt_blocks(blocks, key):
+  return crypt_blocks(as_blocks(blocks), round_keys(key), Te, S, encrypt_shifts)
+
+'''
+ECB decryption, as encrypt_blocks
+'''
+def decrypt_blocks(blocks, key):
+  words = round_keys(key)
+  return crypt_blocks(as_blocks(blocks), decryption_keys(words), Td, S_inv, decrypt_shifts)
+
+'''
+Cipher object for aes_backend: one shared key, round keys expanded once
+'''
+class AESNumpy:
+  def __init__(self, key_bytes):
+    self.ek = round_keys(key_bytes)
+    self.dk = decryption_keys(self.ek)
+
+  def encrypt(self, data):
+    return crypt_blocks(as_blocks(data), self.ek, Te, S, encrypt_shifts).tobytes()
+
+  def decrypt(self, data):
+    return crypt_blocks(as_blocks(data), self.dk, Td, S_inv, decrypt_shifts).tobytes()
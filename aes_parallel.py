@@ -0,0 +1,131 @@
+'''
+Multi-core chunked AES encryption/decryption of large files (See challenge_util, aes_stream)
+
+ECB (both ways), CBC decryption and CTR (both ways) are parallel across blocks, so the input is split into
+block-aligned chunks that worker processes handle independently:
+  CBC decryption of a chunk only needs the last CT block of the previous chunk (or the IV for the first)
+  CTR of a chunk only needs its byte offset into the keystream
+Each worker memory-maps the input and the output file and writes its result at the chunk's own offset
+CBC encryption is sequential, so it falls back to streaming through aes_stream on one core
+
+To run: python3 aes_parallel.py <encrypt|decrypt> <ECB|CBC|CTR> <hex key> <hex IV or nonce (not for ECB)> <input file> <output file> <Optional: workers>
+'''
+
+import mmap
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from challenge_util import *
+import aes_stream
+
+parallel_chunk_size = 1 << 24 # Multiple of AES_block_size
+
+'''
+Memory-maps filename for reading, or for writing if write = True
+'''
+def map_file(filename, write = False):
+  with open(filename, 'r+b' if write else 'rb') as f:
+    return mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_WRITE if write else mmap.ACCESS_READ)
+
+'''
+Worker: process bytes [start, end) of in_filename into out_filename at the same offset
+is_last: whether this chunk ends the input (pkcs7 is applied there when encrypting ECB)
+'''
+def crypt_chunk(mode, in_filename, out_filename, key_bytes, IV, decrypt, start, end, is_last):
+  # CBC decryption also reads the CT block before the chunk
+  read_from = max(start - AES_block_size, 0) if mode == "CBC" else start
+  if end > read_from:
+    with map_file(in_filename) as fin:
+      data = fin[read_from:end]
+  else:
+    data = b"" # Padding-only last chunk of an empty (or block-aligned) input
+
+  if mode == "ECB":
+    if decrypt:
+      output = lib_ECB_decrypt(data, key_bytes)
+    else:
+      output = lib_ECB_encrypt(pkcs7(data) if is_last else data, key_bytes)
+  elif mode == "CBC":
+    assert(decrypt)
+    if start == 0:
+      output = CBC_decrypt(data, key_bytes, IV)
+    else:
+      output = CBC_decrypt(data[AES_block_size:], key_bytes, data[:AES_block_size])
+  elif mode == "CTR":
+    output = CTR_encrypt(data, key_bytes, IV, start)
+  else:
+    raise ValueError("Unknown mode: {0}".format(mode))
+  with map_file(out_filename, write = True) as fout:
+    fout[start : start + len(output)] = output
+    fout.flush()
+  return len(output)
+
+'''
+Returns [(start, end, is_last), ...] splitting n bytes into block-aligned chunks
+An encryption with padding always gets a last chunk, even if it is empty
+'''
+def split_chunks(n, chunk_size, padded):
+  chunks = []
+  for start in range(0, n, chunk_size):
+    end = min(start + chunk_size, n)
+    chunks.append((start, end, end == n))
+  if padded and (len(chunks) == 0 or n % AES_block_size == 0):
+    # Padding adds a whole block: give it its own (empty) last chunk
+    if len(chunks) != 0:
+      chunks[-1] = (chunks[-1][0], chunks[-1][1], False)
+    chunks.append((n, n, True))
+  return chunks
+
+'''
+Encrypts (or decrypts if decrypt = True) in_filename into out_filename with mode "ECB", "CBC" or "CTR"
+IV is the CBC IV or the CTR nonce, unused for ECB. workers = None uses every core
+Returns the size of the output
+'''
+def crypt_file(mode, in_filename, out_filename, key_bytes, IV = None, decrypt = False, workers = None, chunk_size = parallel_chunk_size):
+  assert(chunk_size % AES_block_size == 0)
+  if mode == "CBC" and not decrypt:
+    return aes_stream.stream_file(aes_stream.CBCEncryptor(key_bytes, IV), in_filename, out_filename)
+
+  n = os.path.getsize(in_filename)
+  padded = mode in ["ECB", "CBC"]
+  if padded and decrypt:
+    assert(n % AES_block_size == 0 and n > 0)
+  out_size = n + (AES_block_size - n % AES_block_size if padded and not decrypt else 0)
+  with open(out_filename, 'wb') as fout:
+    fout.truncate(out_size)
+  if out_size == 0:
+    return 0
+
+  chunks = split_chunks(n, chunk_size, padded and not decrypt)
+  with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+    futures = [pool.submit(crypt_chunk, mode, in_filename, out_filename, key_bytes, IV, decrypt, start, end, is_last)
+               for start, end, is_last in chunks]
+    for future in futures:
+      future.result()
+
+  # Strip padding now that the last block is decrypted
+  if padded and decrypt:
+    with open(out_filename, 'r+b') as fout:
+      fout.seek(out_size - 1)
+      padding = fout.read(1)[0]
+      out_size -= padding
+      fout.truncate(out_size)
+  return out_size
+
+def main(argv):
+  direction, mode, key = argv[1], argv[2], codecs.decode(argv[3], "hex")
+  if mode == "ECB":
+    IV = None
+    rest = argv[4:]
+  else:
+    IV = codecs.decode(argv[4], "hex")
+    rest = argv[5:]
+  workers = int(rest[2]) if len(rest) >= 3 else None
+  written = crypt_file(mode, rest[0], rest[1], key, IV, direction == "decrypt", workers)
+  print("Wrote {0} bytes to {1}".format(written, rest[1]))
+
+if __name__ == "__main__":
+  if len(sys.argv) >= 6 and sys.argv[1] in ["encrypt", "decrypt"]:
+    main(sys.argv)
+  else:
+    print("Usage: python3 aes_parallel.py <encrypt|decrypt> <ECB|CBC|CTR> <hex key> <hex IV or nonce (not for ECB)> <input file> <output file> <Optional: workers>")
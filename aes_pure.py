@@ -0,0 +1,146 @@
+'''
+Pure Python AES (128/192/256-bit keys) for machines without a C AES library (See aes_backend)
+
+Uses 32-bit T-tables: each table entry combines SubBytes and MixColumns for one byte position,
+so a round is 16 table lookups and XORs on four column words. Decryption uses the equivalent
+inverse cipher, with InvMixColumns folded into the round keys
+ECB only, on any multiple of 16 bytes; the modes are built on top in challenge_util
+'''
+
+import struct
+
+#
+# Tables
+#
+'''
+Multiplication in GF(2^8) modulo x^8 + x^4 + x^3 + x + 1
+'''
+def gf_mul(a, b):
+  product = 0
+  while b != 0:
+    if b & 1:
+      product ^= a
+    a <<= 1
+    if a & 0x100:
+      a ^= 0x11b
+    b >>= 1
+  return product
+
+'''
+Returns (S-box, inverse S-box): multiplicative inverse followed by the affine map
+'''
+def make_sboxes():
+  sbox = [0] * 256
+  for x in range(256):
+    inverse = 0 if x == 0 else next(y for y in range(1, 256) if gf_mul(x, y) == 1)
+    s = inverse
+    for shift in range(1, 5):
+      s ^= ((inverse << shift) | (inverse >> (8 - shift))) & 0xff
+    sbox[x] = s ^ 0x63
+  inv_sbox = [0] * 256
+  for x in range(256):
+    inv_sbox[sbox[x]] = x
+  return sbox, inv_sbox
+
+def rotate_right(word, bits):
+  return ((word >> bits) | (word << (32 - bits))) & 0xffffffff
+
+S, S_inv = make_sboxes()
+Te0 = [(gf_mul(s, 2) << 24) | (s << 16) | (s << 8) | gf_mul(s, 3) for s in S]
+Te1 = [rotate_right(t, 8) for t in Te0]
+Te2 = [rotate_right(t, 16) for t in Te0]
+Te3 = [rotate_right(t, 24) for t in Te0]
+Td0 = [(gf_mul(s, 14) << 24) | (gf_mul(s, 9) << 16) | (gf_mul(s, 13) << 8) | gf_mul(s, 11) for s in S_inv]
+Td1 = [rotate_right(t, 8) for t in Td0]
+Td2 = [rotate_right(t, 16) for t in Td0]
+Td3 = [rotate_right(t, 24) for t in Td0]
+Rcon = [0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80, 0x1b, 0x36]
+
+#
+# Key schedule
+#
+'''
+Returns the 4 (rounds + 1) round key words for a 16, 24 or 32 byte key
+'''
+def expand_key(key_bytes):
+  if len(key_bytes) not in [16, 24, 32]:
+    raise ValueError("Incorrect AES key length ({0} bytes)".format(len(key_bytes)))
+  Nk = len(key_bytes) // 4
+  rounds = Nk + 6
+  words = list(struct.unpack(">{0}I".format(Nk), key_bytes))
+  for i in range(Nk, 4 * (rounds + 1)):
+    temp = words[i-1]
+    if i % Nk == 0:
+      temp = ((temp << 8) | (temp >> 24)) & 0xffffffff
+      temp = (S[temp >> 24] << 24) | (S[(temp >> 16) & 0xff] << 16) | (S[(temp >> 8) & 0xff] << 8) | S[temp & 0xff]
+      temp ^= Rcon[i // Nk - 1] << 24
+    elif Nk > 6 and i % Nk == 4:
+      temp = (S[temp >> 24] << 24) | (S[(temp >> 16) & 0xff] << 16) | (S[(temp >> 8) & 0xff] << 8) | S[temp & 0xff]
+    words.append(words[i - Nk] ^ temp)
+  return words
+
+'''
+Returns the round key words of the equivalent inverse cipher: reversed round order, InvMixColumns on the middle rounds
+'''
+def decryption_key(words):
+  rounds = len(words) // 4 - 1
+  dk = []
+  for r in range(rounds, -1, -1):
+    for w in words[4 * r : 4 * r + 4]:
+      if r != 0 and r != rounds:
+        w = Td0[S[w >> 24]] ^ Td1[S[(w >> 16) & 0xff]] ^ Td2[S[(w >> 8) & 0xff]] ^ Td3[S[w & 0xff]]
+      dk.append(w)
+  return dk
+
+#
+# Cipher
+#
+class AESPure:
+  def __init__(self, key_bytes):
+    self.ek = expand_key(bytes(key_bytes))
+    self.dk = decryption_key(self.ek)
+    self.rounds = len(self.ek) // 4 - 1
+
+  # ECB encryption of a multiple of 16 bytes
+  def encrypt(self, data):
+    assert(len(data) % 16 == 0)
+    words = struct.unpack(">{0}I".format(len(data) // 4), data)
+    out = []
+    rk = self.ek
+    last = 4 * self.rounds
+    for b in range(0, len(words), 4):
+      s0, s1, s2, s3 = words[b] ^ rk[0], words[b+1] ^ rk[1], words[b+2] ^ rk[2], words[b+3] ^ rk[3]
+      for k in range(4, last, 4):
+        s0, s1, s2, s3 = (
+          Te0[s0 >> 24] ^ Te1[(s1 >> 16) & 0xff] ^ Te2[(s2 >> 8) & 0xff] ^ Te3[s3 & 0xff] ^ rk[k],
+          Te0[s1 >> 24] ^ Te1[(s2 >> 16) & 0xff] ^ Te2[(s3 >> 8) & 0xff] ^ Te3[s0 & 0xff] ^ rk[k+1],
+          Te0[s2 >> 24] ^ Te1[(s3 >> 16) & 0xff] ^ Te2[(s0 >> 8) & 0xff] ^ Te3[s1 & 0xff] ^ rk[k+2],
+          Te0[s3 >> 24] ^ Te1[(s0 >> 16) & 0xff] ^ Te2[(s1 >> 8) & 0xff] ^ Te3[s2 & 0xff] ^ rk[k+3])
+      out += [
+        ((S[s0 >> 24] << 24) | (S[(s1 >> 16) & 0xff] << 16) | (S[(s2 >> 8) & 0xff] << 8) | S[s3 & 0xff]) ^ rk[last],
+        ((S[s1 >> 24] << 24) | (S[(s2 >> 16) & 0xff] << 16) | (S[(s3 >> 8) & 0xff] << 8) | S[s0 & 0xff]) ^ rk[last+1],
+        ((S[s2 >> 24] << 24) | (S[(s3 >> 16) & 0xff] << 16) | (S[(s0 >> 8) & 0xff] << 8) | S[s1 & 0xff]) ^ rk[last+2],
+        ((S[s3 >> 24] << 24) | (S[(s0 >> 16) & 0xff] << 16) | (S[(s1 >> 8) & 0xff] << 8) | S[s2 & 0xff]) ^ rk[last+3]]
+    return struct.pack(">{0}I".format(len(out)), *out)
+
+  # ECB decryption of a multiple of 16 bytes
+  def decrypt(self, data):
+    assert(len(data) % 16 == 0)
+    words = struct.unpack(">{0}I".format(len(data) // 4), data)
+    out = []
+    rk = self.dk
+    last = 4 * self.rounds
+    for b in range(0, len(words), 4):
+      s0, s1, s2, s3 = words[b] ^ rk[0], words[b+1] ^ rk[1], words[b+2] ^ rk[2], words[b+3] ^ rk[3]
+      for k in range(4, last, 4):
+        s0, s1, s2, s3 = (
+          Td0[s0 >> 24] ^ Td1[(s3 >> 16) & 0xff] ^ Td2[(s2 >> 8) & 0xff] ^ Td3[s1 & 0xff] ^ rk[k],
+          Td0[s1 >> 24] ^ Td1[(s0 >> 16) & 0xff] ^ Td2[(s3 >> 8) & 0xff] ^ Td3[s2 & 0xff] ^ rk[k+1],
+          Td0[s2 >> 24] ^ Td1[(s1 >> 16) & 0xff] ^ Td2[(s0 >> 8) & 0xff] ^ Td3[s3 & 0xff] ^ rk[k+2],
+          Td0[s3 >> 24] ^ Td1[(s2 >> 16) & 0xff] ^ Td2[(s1 >> 8) & 0xff] ^ Td3[s0 & 0xff] ^ rk[k+3])
+      out += [
+        ((S_inv[s0 >> 24] << 24) | (S_inv[(s3 >> 16) & 0xff] << 16) | (S_inv[(s2 >> 8) & 0xff] << 8) | S_inv[s1 & 0xff]) ^ rk[last],
+        ((S_inv[s1 >> 24] << 24) | (S_inv[(s0 >> 16) & 0xff] << 16) | (S_inv[(s3 >> 8) & 0xff] << 8) | S_inv[s2 & 0xff]) ^ rk[last+1],
+        ((S_inv[s2 >> 24] << 24) | (S_inv[(s1 >> 16) & 0xff] << 16) | (S_inv[(s0 >> 8) & 0xff] << 8) | S_inv[s3 & 0xff]) ^ rk[last+2],
+        ((S_inv[s3 >> 24] << 24) | (S_inv[(s2 >> 16) & 0xff] << 16) | (S_inv[(s1 >> 8) & 0xff] << 8) | S_inv[s0 & 0xff]) ^ rk[last+3]]
+    return struct.pack(">{0}I".format(len(out)), *out)
@@ -0,0 +1,161 @@
+'''
+Incremental AES encryption/decryption for ECB, CBC and CTR (See challenge_util)
+
+Each encryptor/decryptor takes data in pieces of any size through update(), which returns whatever
+output is ready, and finalize(), which returns the rest:
+  ECB/CBC encryptors keep the partial last block and apply pkcs7 only at finalize
+  ECB/CBC decryptors hold back the last full block, since it carries the padding, and strip it at finalize
+  CBC carries its chaining block between updates, CTR carries its byte offset into the keystream
+stream() then moves data between file objects through one of them in constant memory
+
+To run: python3 aes_stream.py <encrypt|decrypt> <ECB|CBC|CTR> <hex key> <hex IV or nonce (not for ECB)> <input file> <output file>
+'''
+
+import sys
+from challenge_util import *
+
+stream_chunk_size = 1 << 20
+
+'''
+Base class for the block modes: buffers input and processes whole blocks
+Subclasses implement process(blocks) for a multiple of AES_block_size bytes
+'''
+class BlockCryptor:
+  def __init__(self, hold_back):
+    self.buffer = bytearray()
+    self.hold_back = hold_back # Keep the last full block until finalize (decryptors)
+    self.finalized = False
+
+  def update(self, data):
+    assert(not self.finalized)
+    self.buffer += data
+    ready = len(self.buffer) - len(self.buffer) % AES_block_size
+    if self.hold_back and ready == len(self.buffer):
+      ready -= AES_block_size
+    if ready <= 0:
+      return b""
+    blocks = bytes(self.buffer[:ready])
+    del self.buffer[:ready]
+    return self.process(blocks)
+
+  def finalize(self):
+    assert(not self.finalized)
+    self.finalized = True
+    if self.hold_back:
+      assert(len(self.buffer) == AES_block_size)
+      PT_bytes = self.process(bytes(self.buffer))
+      padded = int(PT_bytes[-1])
+      return PT_bytes[:-padded]
+    return self.process(pkcs7(bytes(self.buffer)))
+
+class ECBEncryptor(BlockCryptor):
+  def __init__(self, key_bytes):
+    BlockCryptor.__init__(self, False)
+    self.key = key_bytes
+
+  def process(self, blocks):
+    return lib_ECB_encrypt(blocks, self.key)
+
+class ECBDecryptor(BlockCryptor):
+  def __init__(self, key_bytes):
+    BlockCryptor.__init__(self, True)
+    self.key = key_bytes
+
+  def process(self, blocks):
+    return bytes(lib_ECB_decrypt(blocks, self.key))
+
+class CBCEncryptor(BlockCryptor):
+  def __init__(self, key_bytes, IV):
+    BlockCryptor.__init__(self, False)
+    self.key = key_bytes
+    self.CT_block = bytes(IV)
+
+  # Sequential by nature: each block needs the previous CT block
+  def process(self, blocks):
+    CT_bytes = bytearray()
+    for i in range(len(blocks) // AES_block_size):
+      self.CT_block = lib_ECB_encrypt(fixed_xor(self.CT_block, get_block(blocks, i)), self.key)
+      CT_bytes += self.CT_block
+    return bytes(CT_bytes)
+
+class CBCDecryptor(BlockCryptor):
+  def __init__(self, key_bytes, IV):
+    BlockCryptor.__init__(self, True)
+    self.key = key_bytes
+    self.CT_block = bytes(IV)
+
+  # Whole run of blocks in one call, chained from the last CT block of the previous run (See CBC_decrypt)
+  def process(self, blocks):
+    PT_bytes = CBC_decrypt(blocks, self.key, self.CT_block)
+    self.CT_block = blocks[-AES_block_size:]
+    return PT_bytes
+
+class CTRCryptor:
+  def __init__(self, key_bytes, nonce_bytes, offset = 0):
+    self.key = key_bytes
+    self.nonce = nonce_bytes
+    self.offset = offset
+
+  def update(self, data):
+    output = CTR_encrypt(data, self.key, self.nonce, self.offset)
+    self.offset += len(data)
+    return output
+
+  def finalize(self):
+    return b""
+
+# CTR encryption and decryption are the same operation
+CTREncryptor = CTRCryptor
+CTRDecryptor = CTRCryptor
+
+'''
+Returns an encryptor (or decryptor if decrypt = True) for mode "ECB", "CBC" or "CTR"
+IV is the CBC IV or the CTR nonce, unused for ECB
+'''
+def new_cryptor(mode, key_bytes, IV = None, decrypt = False):
+  if mode == "ECB":
+    return ECBDecryptor(key_bytes) if decrypt else ECBEncryptor(key_bytes)
+  if mode == "CBC":
+    return CBCDecryptor(key_bytes, IV) if decrypt else CBCEncryptor(key_bytes, IV)
+  if mode == "CTR":
+    return CTRCryptor(key_bytes, IV)
+  raise ValueError("Unknown mode: {0}".format(mode))
+
+'''
+Reads fin to the end in chunks, writes everything cryptor outputs to fout
+Returns number of bytes written
+'''
+def stream(cryptor, fin, fout, chunk_size = stream_chunk_size):
+  written = 0
+  while True:
+    chunk = fin.read(chunk_size)
+    if len(chunk) == 0:
+      break
+    written += fout.write(cryptor.update(chunk))
+  written += fout.write(cryptor.finalize())
+  return written
+
+'''
+stream() between two files given by name
+'''
+def stream_file(cryptor, in_filename, out_filename, chunk_size = stream_chunk_size):
+  with open(in_filename, 'rb') as fin, open(out_filename, 'wb') as fout:
+    return stream(cryptor, fin, fout, chunk_size)
+
+def main(argv):
+  direction, mode, key = argv[1], argv[2], codecs.decode(argv[3], "hex")
+  if mode == "ECB":
+    IV = None
+    in_filename, out_filename = argv[4], argv[5]
+  else:
+    IV = codecs.decode(argv[4], "hex")
+    in_filename, out_filename = argv[5], argv[6]
+  cryptor = new_cryptor(mode, key, IV, decrypt = (direction == "decrypt"))
+  written = stream_file(cryptor, in_filename, out_filename)
+  print("Wrote {0} bytes to {1}".format(written, out_filename))
+
+if __name__ == "__main__":
+  if len(sys.argv) >= 6 and sys.argv[1] in ["encrypt", "decrypt"]:
+    main(sys.argv)
+  else:
+    print("Usage: python3 aes_stream.py <encrypt|decrypt> <ECB|CBC|CTR> <hex key> <hex IV or nonce (not for ECB)> <input file> <output file>")
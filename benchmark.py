@@ -0,0 +1,606 @@
+'''
+Benchmarks for the shared helpers in challenge_util and friends
+Each benchmark compares against the original per-byte implementation where there is one
+
+To run: python3 benchmark.py <benchmark name> [benchmark arguments]
+'''
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from challenge_util import *
+import aes_backend
+import hamming
+import xor_detect
+import aes_parallel
+import aes_stream
+
+#
+# Original implementations, kept as baselines
+#
+def loop_fixed_xor(b1, b2):
+  assert(len(b1) == len(b2))
+  xored = bytearray()
+  for i in range(len(b1)):
+    xored.append(b1[i] ^ b2[i])
+  return bytes(xored)
+
+def loop_repeated_xor(key, x):
+  xored = bytearray()
+  for i in range(len(x)):
+    xored.append(x[i] ^ key[i % len(key)])
+  return bytes(xored)
+
+def loop_single_byte_xor(CT_bytes, score_set):
+  best_score = -1
+  best_key = None
+  for key in range(2 ** 8):
+    PT = bytearray()
+    for i in range(len(CT_bytes)):
+      PT.append(CT_bytes[i] ^ key)
+    score = score_string(PT, score_set)
+    if score >= best_score:
+      best_score = score
+      best_key = key
+  return (best_score, best_key)
+
+def loop_hamming(x, y):
+  assert(len(x) == len(y))
+  count = 0
+  for i in range(len(x)):
+    xored = x[i] ^ y[i]
+    xored_bin = bin(xored)[1:]
+    for j in range(len(xored_bin)):
+      if xored_bin[j] == "1":
+        count += 1
+  return count
+
+def loop_read_challenge(filename, encoding):
+  CT = ""
+  with open(filename, 'r') as fin:
+    for line in fin:
+      CT += line
+  if encoding == "ascii":
+    return codecs.encode(CT)
+  else:
+    return codecs.decode(codecs.encode(CT), encoding)
+
+def loop_CBC_decrypt(CT_bytes, key_bytes, IV):
+  assert(len(CT_bytes) % AES_block_size == 0)
+  PT_bytes = bytearray()
+  CT_block = IV
+  for i in range(len(CT_bytes) // AES_block_size):
+    PT_bytes += loop_fixed_xor(CT_block, lib_ECB_decrypt(get_block(CT_bytes, i), key_bytes))
+    CT_block = get_block(CT_bytes, i)
+  return bytes(PT_bytes)
+
+def full_edit(CT_bytes, key_bytes, nonce_bytes, offset, newtext):
+  PT_bytes = CTR_decrypt(CT_bytes, key_bytes, nonce_bytes)
+  PT_bytes = PT_bytes[:offset] + newtext + PT_bytes[offset + len(newtext):]
+  return CTR_encrypt(PT_bytes, key_bytes, nonce_bytes)
+
+def loop_find_repeated_chunks(x):
+  num_bytes = len(x) // 16
+  repeated = []
+  for i in range(num_bytes):
+    for j in range(i+1, num_bytes):
+      if get_block(x, i) == get_block(x, j):
+        repeated.append((i,j))
+  return repeated
+
+def loop_random_bytes(n):
+  output = bytearray()
+  for i in range(n):
+    output.append(random.randint(0, 255))
+  return bytes(output)
+
+def uncached_ECB_encrypt(PT_bytes, key_bytes):
+  cipher = aes_backend.get_backend().new(key_bytes)
+  return bytes(cipher.encrypt(PT_bytes))
+
+def loop_CTR_encrypt(PT_bytes, key_bytes, nonce_bytes):
+  ctr = 0
+  keystream = bytearray()
+  while len(keystream) < len(PT_bytes):
+    msg = nonce_bytes + ctr.to_bytes(8, "little")
+    keystream += lib_ECB_encrypt(msg, key_bytes)
+    ctr += 1
+  CT_bytes = loop_fixed_xor(PT_bytes, keystream[:len(PT_bytes)])
+  return bytes(CT_bytes)
+
+'''
+challenge17's padding attack and oracle check before the probe and decryption buffers were reused:
+a fresh modification and probe per query, and a fresh plaintext per decryption
+'''
+class LoopPaddingOracle:
+  def __init__(self, oracle):
+    self.AES_key = oracle.AES_key
+
+  def function2(self, IV, CT_bytes):
+    PT_bytes = CBC_decrypt(CT_bytes, self.AES_key, IV)
+    padding = int(PT_bytes[-1])
+    if padding == 0:
+      return False
+    for i in range(padding):
+      if PT_bytes[-(i+1)] != padding:
+        return False
+    return True
+
+def loop_padding_attack(oracle, IV, CT_bytes):
+  guess = bytearray()
+  for i in range(len(CT_bytes) // AES_block_size):
+    block_idx = len(CT_bytes) // AES_block_size - 1 - i
+    target_block = get_block(CT_bytes, block_idx)
+    prev_block = IV if block_idx == 0 else get_block(CT_bytes, block_idx - 1)
+    CT_fragment = prev_block + target_block
+    guess_block = bytearray(AES_block_size)
+    pad_len = 1
+    while pad_len <= AES_block_size:
+      modification = bytearray(2 * AES_block_size)
+      for j in range(1, pad_len + 1):
+        modification[-AES_block_size-j] = guess_block[-j] ^ pad_len
+      if oracle.function2(IV, fixed_xor(CT_fragment, modification)):
+        pad_len += 1
+      elif guess_block[-pad_len] < 255:
+        guess_block[-pad_len] += 1
+      else:
+        guess_block[-pad_len] = 0
+        pad_len -= 1
+        guess_block[-pad_len] += 1
+    guess = guess_block + guess
+  return bytes(guess)
+
+#
+# Helpers
+#
+'''
+Returns best wall-clock time in seconds of fn() over repeat runs
+'''
+def time_it(fn, repeat = 3):
+  best = None
+  for i in range(repeat):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+'''
+Peak bytes allocated while running fn once (tracemalloc), on top of what was allocated before
+'''
+def peak_allocated(fn):
+  tracemalloc.start()
+  try:
+    base = tracemalloc.get_traced_memory()[0]
+    fn()
+    return tracemalloc.get_traced_memory()[1] - base
+  finally:
+    tracemalloc.stop()
+
+'''
+Number of memory blocks allocated while running fn once, counted from sys.getallocatedblocks() at every
+call and return (sys.setprofile), so temporaries freed within the run are counted too
+These are pymalloc blocks (objects up to 512 bytes, e.g. per-block slices, views and small ints): larger buffers
+show in peak_allocated. The count includes a few blocks of profiling overhead per Python call
+'''
+def allocation_count(fn):
+  state = {"blocks": sys.getallocatedblocks(), "allocated": 0}
+  def hook(frame, event, arg):
+    blocks = sys.getallocatedblocks()
+    state["allocated"] += max(blocks - state["blocks"], 0)
+    state["blocks"] = blocks
+  sys.setprofile(hook)
+  try:
+    fn()
+  finally:
+    sys.setprofile(None)
+  return state["allocated"]
+
+def format_size(n):
+  for unit in ["B", "KB", "MB", "GB"]:
+    if n < 1024 or unit == "GB":
+      return "{0:g} {1}".format(n, unit)
+    n /= 1024
+
+def report(name, size, old, new):
+  print("{0:14} | {1:>8} | old {2:10.6f}s | new {3:10.6f}s | speedup {4:8.1f}x".format(name, format_size(size), old, new, old / new))
+
+'''
+Peak bytes and allocation count of old() and new(), side by side
+'''
+def report_alloc(name, size, old, new):
+  print("{0:14} | {1:>8} | old peak {2:>10} | new peak {3:>10} | old allocs {4:>9} | new allocs {5:>9}".format(
+    name, format_size(size), format_size(peak_allocated(old)), format_size(peak_allocated(new)), allocation_count(old), allocation_count(new)))
+
+#
+# Benchmarks
+#
+'''
+fixed_xor and repeated_xor against the original byte loops
+Default sizes: 1 KB, 1 MB, 100 MB
+'''
+def bench_xor(sizes = (1 << 10, 1 << 20, 100 << 20)):
+  key = b"ICE"
+  for n in sizes:
+    b1 = random.getrandbits(8 * n).to_bytes(n, "little")
+    b2 = random.getrandbits(8 * n).to_bytes(n, "little")
+    repeat = 3 if n <= (1 << 20) else 1
+    out = bytearray(n)
+    report("fixed_xor", n, time_it(lambda: loop_fixed_xor(b1, b2), repeat), time_it(lambda: fixed_xor(b1, b2), repeat))
+    report("fixed_xor out=", n, time_it(lambda: loop_fixed_xor(b1, b2), repeat), time_it(lambda: fixed_xor(b1, b2, out), repeat))
+    report("repeated_xor", n, time_it(lambda: loop_repeated_xor(key, b1), repeat), time_it(lambda: repeated_xor(key, b1), repeat))
+
+'''
+Single-byte XOR key search: 256 decrypt-and-score passes against one histogram
+Default column lengths: 64 B, 1 KB, 64 KB
+'''
+def bench_single_byte(sizes = (64, 1 << 10, 64 << 10)):
+  PT = codecs.encode("Now that the party is jumping. ")
+  for n in sizes:
+    CT_bytes = repeated_xor(b"X", (PT * (n // len(PT) + 1))[:n])
+    assert(loop_single_byte_xor(CT_bytes, ascii_letterspaces) == rank_xor_keys(CT_bytes, ascii_letterspaces)[0])
+    report("single-byte", n, time_it(lambda: loop_single_byte_xor(CT_bytes, ascii_letterspaces)), time_it(lambda: rank_xor_keys(CT_bytes, ascii_letterspaces)))
+
+'''
+Streaming single-byte XOR detection (xor_detect) against challenge4's per-line loop
+Default: 1M random 30-byte hex lines, workers from 1 to all cores
+'''
+def bench_detect(sizes = (1 << 20,)):
+  for n in sizes:
+    with tempfile.NamedTemporaryFile('wb', suffix = ".txt", delete = False) as fout:
+      filename = fout.name
+      for i in range(n):
+        fout.write(codecs.encode(random.getrandbits(240).to_bytes(30, "little"), "hex") + b"\n")
+    try:
+      sample = min(n, 1 << 14)
+      lines = open(filename, 'rb').readlines()[:sample]
+      old = time_it(lambda: [rank_xor_keys(codecs.decode(line.strip(), "hex"), ascii_letterspaces)[0] for line in lines], 1) * n / sample
+      print("{0} lines, per-line loop (extrapolated from {1} lines): {2:.2f}s".format(n, sample, old))
+      workers = 1
+      while workers <= os.cpu_count():
+        new = time_it(lambda: xor_detect.detect(filename, ascii_letterspaces, 10, workers), 1)
+        print("{0} lines, {1:2} workers: {2:8.2f}s | {3:10.0f} lines/s | speedup {4:6.1f}x".format(n, workers, new, n / new, old / new))
+        workers *= 2
+    finally:
+      os.remove(filename)
+
+'''
+Hamming distance kernels against challenge6's bin() loop
+Default sizes: 1 KB, 64 KB, 1 MB; the matrix is over up to 1024 blocks of 32 bytes
+'''
+def bench_hamming(sizes = (1 << 10, 64 << 10, 1 << 20)):
+  for n in sizes:
+    x = random.getrandbits(8 * n).to_bytes(n, "little")
+    y = random.getrandbits(8 * n).to_bytes(n, "little")
+    old = time_it(lambda: loop_hamming(x, y))
+    report("hamming", n, old, time_it(lambda: hamming.hamming(x, y)))
+    report("hamming numpy", n, old, time_it(lambda: hamming.hamming(x, y, True)))
+    blocks = [x[i : i+32] for i in range(0, min(n, 1 << 15), 32)]
+    pairs = len(blocks) * (len(blocks) - 1) // 2
+    old = time_it(lambda: [loop_hamming(blocks[i], blocks[j]) for i in range(len(blocks)) for j in range(i+1, len(blocks))], 1)
+    report("matrix", len(blocks) * 32, old, time_it(lambda: hamming.hamming_matrix(blocks), 1))
+    report("matrix numpy", len(blocks) * 32, old, time_it(lambda: hamming.hamming_matrix(blocks, True), 1))
+
+'''
+read_challenge (memory-mapped, chunked binascii decoding) against the original string concatenation
+Default sizes (decoded): 1 MB, 16 MB, 64 MB of base64 in 60-character lines
+'''
+def bench_read(sizes = (1 << 20, 16 << 20, 64 << 20)):
+  for n in sizes:
+    with tempfile.NamedTemporaryFile('wb', suffix = ".txt", delete = False) as fout:
+      filename = fout.name
+      encoded = codecs.encode(random.getrandbits(8 * n).to_bytes(n, "little"), "base64").replace(b"\n", b"")
+      for i in range(0, len(encoded), 60):
+        fout.write(encoded[i : i+60] + b"\n")
+      del encoded
+    try:
+      assert(loop_read_challenge(filename, "base64") == read_challenge(filename, "base64"))
+      report("read_challenge", n, time_it(lambda: loop_read_challenge(filename, "base64"), 1), time_it(lambda: read_challenge(filename, "base64"), 1))
+    finally:
+      os.remove(filename)
+
+'''
+CBC_decrypt (one ECB call and one XOR) against the original block loop
+Default sizes: 1 KB, 64 KB, 1 MB
+'''
+def bench_cbc(sizes = (1 << 10, 64 << 10, 1 << 20)):
+  key = random_bytes(AES_block_size)
+  IV = random_bytes(AES_block_size)
+  for n in sizes:
+    CT_bytes = random.getrandbits(8 * n).to_bytes(n, "little")
+    assert(loop_CBC_decrypt(CT_bytes, key, IV) == CBC_decrypt(CT_bytes, key, IV))
+    report("CBC_decrypt", n, time_it(lambda: loop_CBC_decrypt(CT_bytes, key, IV)), time_it(lambda: CBC_decrypt(CT_bytes, key, IV)))
+
+'''
+CBC_encrypt_many (one ECB call per round) against one CBC_encrypt per message, on messages of 0 to 200 bytes
+Default sizes (number of messages): 100, 10000
+'''
+def bench_cbc_many(sizes = (100, 10000)):
+  key = random_bytes(AES_block_size)
+  for n in sizes:
+    PT_list = [random_bytes(random.randint(0, 200)) for i in range(n)]
+    IVs = [random_bytes(AES_block_size) for i in range(n)]
+    assert(CBC_encrypt_many(PT_list, key, IVs) == [CBC_encrypt(PT_list[m], key, IVs[m]) for m in range(n)])
+    old = time_it(lambda: [CBC_encrypt(PT_list[m], key, IVs[m]) for m in range(n)])
+    report("CBC_encrypt_many", n, old, time_it(lambda: CBC_encrypt_many(PT_list, key, IVs)))
+
+'''
+lib_ECB_encrypt with the cipher cache against building a cipher object (aes_backend) on every call, one block per call
+Default call counts: 1000, 100000
+'''
+def bench_cache(sizes = (1000, 100000)):
+  key = random_bytes(AES_block_size)
+  block = random_bytes(AES_block_size)
+  for n in sizes:
+    cipher_cache.clear()
+    old = time_it(lambda: [uncached_ECB_encrypt(block, key) for i in range(n)], 1)
+    new = time_it(lambda: [lib_ECB_encrypt(block, key) for i in range(n)], 1)
+    print("{0:8} calls | new cipher per call {1:.4f}s | cached {2:.4f}s | speedup {3:.1f}x | {4}".format(n, old, new, old / new, cipher_cache.stats()))
+
+'''
+CTR_encrypt (bulk keystream, one ECB call) against the original counter loop, plus a seek to the end of the stream
+Default sizes: 1 KB, 64 KB, 1 MB
+'''
+def bench_ctr(sizes = (1 << 10, 64 << 10, 1 << 20)):
+  key = random_bytes(AES_block_size)
+  nonce = random_bytes(AES_block_size // 2)
+  for n in sizes:
+    PT_bytes = random.getrandbits(8 * n).to_bytes(n, "little")
+    assert(loop_CTR_encrypt(PT_bytes, key, nonce) == CTR_encrypt(PT_bytes, key, nonce))
+    old = time_it(lambda: loop_CTR_encrypt(PT_bytes, key, nonce))
+    report("CTR_encrypt", n, old, time_it(lambda: CTR_encrypt(PT_bytes, key, nonce)))
+    report("last 16 bytes", n, old, time_it(lambda: CTR_encrypt(PT_bytes[-16:], key, nonce, n - 16)))
+
+'''
+aes_parallel.crypt_file on 1, 2, 4, ... worker processes against single-core streaming through aes_stream
+CTR encryption and ECB decryption of a file, with throughput per core count
+Default size: 1 GB
+'''
+def bench_parallel(sizes = (1 << 30,)):
+  key = random_bytes(AES_block_size)
+  nonce = random_bytes(AES_block_size // 2)
+  workers = [1 << i for i in range(os.cpu_count().bit_length()) if 1 << i < os.cpu_count()] + [os.cpu_count()]
+  for n in sizes:
+    n -= n % AES_block_size
+    with tempfile.NamedTemporaryFile('wb', delete = False) as fout:
+      in_filename = fout.name
+      for i in range(0, n, 1 << 24):
+        fout.write(os.urandom(min(1 << 24, n - i)))
+    out_filename = in_filename + ".out"
+    try:
+      for mode, decrypt, cryptor in [("CTR", False, lambda: aes_stream.CTRCryptor(key, nonce)),
+                                     ("ECB", True, lambda: aes_stream.ECBDecryptor(key))]:
+        # ECB decryption needs valid padding at the end of the file, so decrypt a fresh encryption
+        source = in_filename
+        if decrypt:
+          source = in_filename + ".enc"
+          aes_parallel.crypt_file(mode, in_filename, source, key)
+        old = time_it(lambda: aes_stream.stream_file(cryptor(), source, out_filename), 1)
+        for w in workers:
+          new = time_it(lambda: aes_parallel.crypt_file(mode, source, out_filename, key, nonce, decrypt, w), 1)
+          report("{0} {1} x{2}".format(mode, "dec" if decrypt else "enc", w), n, old, new)
+          print("{0:14} | {1:>8} | {2:10.1f} MB/s".format("", "", n / new / (1 << 20)))
+        if decrypt:
+          os.remove(source)
+    finally:
+      os.remove(in_filename)
+      if os.path.exists(out_filename):
+        os.remove(out_filename)
+
+'''
+aes_numpy against one library (pycryptodome) call per key, on batches of N blocks (sizes reported in bytes)
+Shared key: one ECB call over all N blocks, also against aes_pure (up to 64K blocks). Key per row: N cipher objects, one block each
+Default sizes (blocks): 1, 16, 256, 4K, 64K, 1M
+'''
+def bench_aes_numpy(sizes = (1, 1 << 4, 1 << 8, 1 << 12, 1 << 16, 1 << 20)):
+  import numpy as np
+  import aes_numpy
+  library = aes_backend.available_backends()["pycryptodome"]
+  pure = aes_backend.available_backends()["pure"]
+  for n in sizes:
+    blocks = random_bytes(n * AES_block_size)
+    keys = np.frombuffer(random_bytes(n * AES_block_size), dtype = np.uint8).reshape(n, AES_block_size)
+    key = keys[0].tobytes()
+    assert(aes_numpy.encrypt_blocks(blocks, key).tobytes() == library.new(key).encrypt(blocks))
+    assert(aes_numpy.decrypt_blocks(blocks, key).tobytes() == library.new(key).decrypt(blocks))
+    new = time_it(lambda: aes_numpy.encrypt_blocks(blocks, key))
+    report("shared key", len(blocks), time_it(lambda: library.new(key).encrypt(blocks)), new)
+    if n <= 1 << 16:
+      report("shared vs pure", len(blocks), time_it(lambda: pure.new(key).encrypt(blocks), 1), new)
+
+    per_row = lambda: b"".join(library.new(keys[i].tobytes()).encrypt(get_block(blocks, i)) for i in range(n))
+    assert(aes_numpy.encrypt_blocks(blocks, keys).tobytes() == per_row())
+    report("key per row", len(blocks), time_it(per_row, 1), time_it(lambda: aes_numpy.encrypt_blocks(blocks, keys), 1))
+
+'''
+Mode helpers returning new bytes against writing into a reused out= buffer: time, peak allocation and allocation count
+Plus the challenge17 padding attack, which reuses one probe buffer and decrypts every query into one buffer, against the original
+Default sizes: 1 KB, 64 KB, 1 MB
+'''
+def bench_zero_copy(sizes = (1 << 10, 64 << 10, 1 << 20)):
+  key = random_bytes(AES_block_size)
+  IV = random_bytes(AES_block_size)
+  for n in sizes:
+    PT_bytes = random_bytes(n)
+    CT_bytes = CBC_encrypt(PT_bytes, key, IV)
+    out = bytearray(len(CT_bytes))
+    cases = [
+      ("CBC_decrypt", lambda: CBC_decrypt(CT_bytes, key, IV), lambda: CBC_decrypt(CT_bytes, key, IV, out)),
+      ("CBC_encrypt", lambda: CBC_encrypt(PT_bytes, key, IV), lambda: CBC_encrypt(PT_bytes, key, IV, out)),
+      ("ECB_encrypt", lambda: ECB_encrypt(PT_bytes, key), lambda: ECB_encrypt(PT_bytes, key, out)),
+      ("CTR_encrypt", lambda: CTR_encrypt(PT_bytes, key, IV[:8]), lambda: CTR_encrypt(PT_bytes, key, IV[:8], 0, out)),
+    ]
+    for name, old, new in cases:
+      report(name, n, time_it(old), time_it(new))
+      report_alloc(name, n, old, new)
+
+  import challenge17
+  with open(os.devnull, 'w') as devnull:
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+      oracle = challenge17.Oracle()
+    finally:
+      sys.stdout = stdout
+  IV, CT_bytes = oracle.function1()
+  loop_oracle = LoopPaddingOracle(oracle)
+  assert(loop_padding_attack(loop_oracle, IV, CT_bytes) == challenge17.padding_attack(oracle, IV, CT_bytes))
+  old = lambda: loop_padding_attack(loop_oracle, IV, CT_bytes)
+  new = lambda: challenge17.padding_attack(oracle, IV, CT_bytes)
+  report("padding_attack", len(CT_bytes), time_it(old, 1), time_it(new, 1))
+  report_alloc("padding_attack", len(CT_bytes), old, new)
+
+'''
+challenge25.edit of 16 bytes in the middle of a ciphertext, in place in a bytearray, against decrypting and re-encrypting it all
+Default sizes: 1 MB, 64 MB
+'''
+def bench_edit(sizes = (1 << 20, 64 << 20)):
+  import challenge25
+  key = random_bytes(AES_block_size)
+  nonce = random_bytes(AES_block_size // 2)
+  newtext = random_bytes(AES_block_size)
+  for n in sizes:
+    CT_bytes = bytearray(CTR_encrypt(random.getrandbits(8 * n).to_bytes(n, "little"), key, nonce))
+    offset = n // 2 + 5
+    expected = full_edit(CT_bytes, key, nonce, offset, newtext)
+    assert(challenge25.edit(CT_bytes, key, nonce, offset, newtext) == expected)
+    report("edit", n, time_it(lambda: full_edit(CT_bytes, key, nonce, offset, newtext), 1),
+           time_it(lambda: challenge25.edit(CT_bytes, key, nonce, offset, newtext)))
+
+'''
+find_repeated_chunks (pairs and counts_only) and detect_ECB against the original pairwise loop (on random blocks, up to 10^4 blocks)
+Allocations of the pairs against the original loop up to 10^3 blocks
+Random blocks (no repeats: detect_ECB reads everything) and ECB-like blocks (1 in 64 repeated: early exit)
+Pairs of ECB-like blocks grow quadratically with n, so they are only listed up to 10^5 blocks
+Default sizes (blocks, reported in bytes): 10^3 to 10^7
+'''
+def bench_repeats(sizes = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7)):
+  for n in sizes:
+    random_blocks = random_bytes(n * AES_block_size)
+    ecb_blocks = bytearray(random_blocks)
+    for i in range(63, n, 64):
+      ecb_blocks[i * AES_block_size : (i+1) * AES_block_size] = get_block(random_blocks, 0)
+    old = None
+    if n <= 10 ** 4:
+      assert(loop_find_repeated_chunks(ecb_blocks) == find_repeated_chunks(ecb_blocks))
+      old = time_it(lambda: loop_find_repeated_chunks(random_blocks), 1)
+    if n <= 10 ** 3:
+      report_alloc("pairs", n * AES_block_size, lambda: loop_find_repeated_chunks(ecb_blocks), lambda: find_repeated_chunks(ecb_blocks))
+    for name, x in [("random", random_blocks), ("ECB-like", ecb_blocks)]:
+      for label, fn in [("pairs", lambda: find_repeated_chunks(x)),
+                        ("counts", lambda: find_repeated_chunks(x, counts_only = True)),
+                        ("detect_ECB", lambda: detect_ECB(x))]:
+        if label == "pairs" and name == "ECB-like" and n > 10 ** 5:
+          continue
+        new = time_it(fn, 1)
+        if old is None:
+          print("{0:19} | {1:>8} | new {2:10.6f}s".format(label + " " + name, format_size(len(x)), new))
+        else:
+          report(label + " " + name, len(x), old, new)
+
+'''
+ecb_index: build time (with and without the Bloom pre-pass), rows indexed and query time
+Corpus of random 80-byte messages (hex lines), 1 in 100 encrypted with one of 10 shared ECB keys
+Default sizes (messages): 10^4, 10^5
+'''
+def bench_ecb_index(sizes = (10 ** 4, 10 ** 5)):
+  import ecb_index
+  keys = [random_bytes(AES_block_size) for i in range(10)]
+  header = random_bytes(AES_block_size)
+  for n in sizes:
+    # Message m uses key m // 100 % len(keys) when m % 100 == 0: a cluster forms for each key used at least twice
+    key_uses = Counter(m // 100 % len(keys) for m in range(0, n, 100))
+    expected_clusters = sum(1 for uses in key_uses.values() if uses >= 2)
+    with tempfile.NamedTemporaryFile('w', suffix = ".txt", delete = False) as fout:
+      corpus = fout.name
+      for m in range(n):
+        if m % 100 == 0:
+          CT_bytes = lib_ECB_encrypt(header + random_bytes(4 * AES_block_size), keys[m // 100 % len(keys)])
+        else:
+          CT_bytes = random_bytes(5 * AES_block_size)
+        fout.write(codecs.encode(CT_bytes, "hex").decode() + "\n")
+    index_filename = corpus + ".db"
+    try:
+      for bloom in [False, True]:
+        start = time.perf_counter()
+        conn = ecb_index.build_index(index_filename, [corpus], "hex", bloom)
+        build = time.perf_counter() - start
+        rows = conn.execute("SELECT COUNT(*) FROM blocks").fetchone()[0]
+        clusters = ecb_index.list_clusters(conn)
+        assert(len(clusters) == expected_clusters)
+        query = time_it(lambda: [ecb_index.cluster_of(conn, m) for m in range(0, 1000)]) / 1000
+        conn.close()
+        print("{0:14} | {1:>8} msgs | build {2:8.3f}s | {3:>8} rows | {4:3} clusters | query {5:8.3f}ms | {6}".format(
+          "ecb_index" + (" bloom" if bloom else ""), n, build, rows, len(clusters), 1000 * query, format_size(os.path.getsize(index_filename))))
+    finally:
+      os.remove(corpus)
+      if os.path.exists(index_filename):
+        os.remove(index_filename)
+
+'''
+random_bytes (one getrandbits call) against the original per-byte randint loop, then challenge11 trials through monte_carlo
+Default sizes: 16 B, 1 KB, 64 KB
+'''
+def bench_random(sizes = (16, 1 << 10, 64 << 10)):
+  for n in sizes:
+    report("random_bytes", n, time_it(lambda: loop_random_bytes(n)), time_it(lambda: random_bytes(n)))
+  import monte_carlo
+  confusion, elapsed = monte_carlo.run("challenge11:trial", 1 << 14)
+  monte_carlo.report(confusion, elapsed)
+
+'''
+byte_at_a_time: queries, bytes sent and time of the dictionary strategy against the per_guess one,
+each with and without the batch oracle (ECB_encrypt_many). Oracle as in challenge14, random prefix of 0..31 bytes and random target
+Default sizes (target bytes): 16, 128, 1024
+'''
+def bench_byte_at_a_time(sizes = (16, 128, 1024)):
+  import byte_at_a_time
+  key = random_bytes(AES_block_size)
+  for n in sizes:
+    prefix, target = random_bytes(random.randint(0, 31)), random_bytes(n)
+    encrypt = lambda PT_bytes: ECB_encrypt(prefix + PT_bytes + target, key)
+    encrypt_many = lambda PT_list: ECB_encrypt_many([prefix + PT_bytes + target for PT_bytes in PT_list], key)
+    for strategy in byte_at_a_time.strategies:
+      for batch in [None, encrypt_many]:
+        counter = byte_at_a_time.QueryCounter(encrypt, batch)
+        start = time.perf_counter()
+        solved = byte_at_a_time.strategies[strategy](counter, len(prefix), n)
+        elapsed = time.perf_counter() - start
+        assert(solved == target)
+        print("{0:19} | {1:>8} | {2:>8} queries | {3:>8} plaintexts | {4:>8} sent | {5:10.6f}s".format(
+          strategy + (" batched" if batch else ""), format_size(n), counter.queries, counter.plaintexts, format_size(counter.bytes_sent), elapsed))
+
+benchmarks = {
+  "xor": bench_xor,
+  "single_byte": bench_single_byte,
+  "detect": bench_detect,
+  "hamming": bench_hamming,
+  "read": bench_read,
+  "cbc": bench_cbc,
+  "cbc_many": bench_cbc_many,
+  "cache": bench_cache,
+  "ctr": bench_ctr,
+  "parallel": bench_parallel,
+  "aes_numpy": bench_aes_numpy,
+  "zero_copy": bench_zero_copy,
+  "edit": bench_edit,
+  "repeats": bench_repeats,
+  "ecb_index": bench_ecb_index,
+  "random": bench_random,
+  "byte_at_a_time": bench_byte_at_a_time,
+}
+
+def main(argv):
+  if len(argv) < 2 or argv[1] not in benchmarks:
+    print("Usage: python3 benchmark.py <{0}> [sizes in bytes...]".format("|".join(sorted(benchmarks))))
+    return
+  print("AES backend: {0}".format(aes_backend.get_backend().name))
+  if len(argv) >= 3:
+    benchmarks[argv[1]]([int(x) for x in argv[2:]])
+  else:
+    benchmarks[argv[1]]()
+
+if __name__ == "__main__":
+  main(sys.argv)
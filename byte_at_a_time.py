@@ -0,0 +1,120 @@
+'''
+Byte-at-a-time ECB decryption, shared by challenge12 and challenge14
+
+The oracle encrypts <prefix><our input><target> under a fixed key in ECB mode
+Our input starts with pad bytes that complete the prefix's last block, so it is block-aligned from block_offset on
+Target byte t is the last byte of a block when s = 15 - (t % 16) filler bytes come before the target, so:
+  alignment: the 16 queries with s = 0..15 filler bytes give the ciphertext block holding every target byte
+  dictionary (default): the 256 candidate blocks <15 known bytes><c> go side by side in one query,
+    so each byte costs one query and one dict lookup (target length + 16 queries overall)
+  per_guess: the original strategy, one query per candidate (up to 256 queries per byte)
+With encrypt_many (PT list -> CT list, as the oracle's encrypt over each), the 16 alignment probes, and the
+observation and 256 guesses of per_guess, go to the oracle as one batch each
+'''
+
+from challenge_util import *
+
+filler = b"A"
+
+'''
+Wraps an oracle (PT bytes -> CT bytes, and optionally its batch form PT list -> CT list)
+Counts the oracle calls made (a batch is one call), the plaintexts and the bytes sent through it
+'''
+class QueryCounter:
+  def __init__(self, encrypt, encrypt_many = None):
+    self.encrypt = encrypt
+    self.encrypt_many = encrypt_many
+    self.queries = 0
+    self.plaintexts = 0
+    self.bytes_sent = 0
+
+  def __call__(self, PT_bytes):
+    self.queries += 1
+    self.plaintexts += 1
+    self.bytes_sent += len(PT_bytes)
+    return self.encrypt(PT_bytes)
+
+  # One batch call if the oracle has one, else one call per plaintext
+  def many(self, PT_list):
+    if self.encrypt_many is None:
+      return [self(PT_bytes) for PT_bytes in PT_list]
+    self.queries += 1
+    self.plaintexts += len(PT_list)
+    self.bytes_sent += sum(len(PT_bytes) for PT_bytes in PT_list)
+    return self.encrypt_many(PT_list)
+
+'''
+Returns (pad length, block_offset): pad bytes complete the prefix's last block, and our input starts at block block_offset
+'''
+def alignment(prefix_len, block_size = AES_block_size):
+  pad_len = -prefix_len % block_size
+  return pad_len, (prefix_len + pad_len) // block_size
+
+'''
+Returns the 15 known bytes that precede target byte len(solved), with filler before the start of the target
+'''
+def known_window(solved, block_size = AES_block_size):
+  return (filler * (block_size - 1) + bytes(solved))[-(block_size - 1):]
+
+'''
+Returns [CT for s filler bytes, s = 0..15]: target byte t is in block block_offset + t // 16 of entry 15 - (t % 16)
+'''
+def alignment_observations(counter, pad_len, block_size = AES_block_size):
+  return counter.many([filler * (pad_len + s) for s in range(block_size)])
+
+'''
+One query per target byte: the 256 candidate blocks encrypted side by side, looked up against the alignment observations
+'''
+def recover_dictionary(counter, prefix_len, target_len, block_size = AES_block_size):
+  pad_len, block_offset = alignment(prefix_len, block_size)
+  observations = alignment_observations(counter, pad_len, block_size)
+  solved = bytearray()
+  while len(solved) < target_len:
+    t = len(solved)
+    window = known_window(solved, block_size)
+    candidates = b"".join([window + bytes([c]) for c in range(256)])
+    CT_bytes = counter(filler * pad_len + candidates)
+    table = {get_block(CT_bytes, block_offset + c, block_size): c for c in range(256)}
+    observation = get_block(observations[block_size - 1 - t % block_size], block_offset + t // block_size, block_size)
+    solved.append(table[observation])
+  return bytes(solved)
+
+'''
+One query per candidate, as in the original challenge12/14 solutions (one batch per byte with encrypt_many)
+'''
+def recover_per_guess(counter, prefix_len, target_len, block_size = AES_block_size):
+  pad_len, block_offset = alignment(prefix_len, block_size)
+  solved = bytearray()
+  while len(solved) < target_len:
+    offset_len = block_size - (len(solved) % block_size) - 1
+    PT_bytes = filler * (pad_len + offset_len)
+    block_idx = block_offset + (offset_len + len(solved)) // block_size
+    guesses = [PT_bytes + solved + bytes([c]) for c in range(256)]
+    if counter.encrypt_many is None:
+      # One query at a time, stopping at the right guess
+      observation = get_block(counter(PT_bytes), block_idx, block_size)
+      CTs = (counter(guess) for guess in guesses)
+    else:
+      CTs = counter.many([PT_bytes] + guesses)
+      observation = get_block(CTs[0], block_idx, block_size)
+      CTs = CTs[1:]
+    for c, CT_bytes in enumerate(CTs):
+      if get_block(CT_bytes, block_idx, block_size) == observation:
+        solved.append(c)
+        break
+  return bytes(solved)
+
+strategies = {
+  "dictionary": recover_dictionary,
+  "per_guess": recover_per_guess,
+}
+
+'''
+Recovers the target_len bytes that the oracle appends after our input, given the length of the prefix before it
+encrypt: PT bytes -> CT bytes (ECB of <prefix><PT><target>), encrypt_many: its batch form, if the oracle has one
+Returns (target bytes, number of oracle calls)
+'''
+def recover_target(encrypt, prefix_len, target_len, strategy = "dictionary", block_size = AES_block_size, encrypt_many = None):
+  counter = QueryCounter(encrypt, encrypt_many)
+  solved = strategies[strategy](counter, prefix_len, target_len, block_size)
+  return solved, counter.queries
@@ -19,14 +19,10 @@ Do not use OpenSSL's CBC code to do CBC mode, even to verify your results. What'
 from challenge_util import *
 
 def ECB_decrypt(CT_bytes, key_bytes):
-  cipher = AES.new(key_bytes, AES.MODE_ECB)
-  PT_bytes = cipher.decrypt(CT_bytes)
-  return bytes(PT_bytes)
+  return bytes(lib_ECB_decrypt(CT_bytes, key_bytes))
 
 def ECB_encrypt(PT_bytes, key_bytes):
-  cipher = AES.new(key_bytes, AES.MODE_ECB)
-  CT_bytes = cipher.encrypt(PT_bytes)
-  return bytes(CT_bytes)
+  return lib_ECB_encrypt(PT_bytes, key_bytes)
 
 def CBC_decrypt(CT_bytes, key_bytes, IV):
   assert(len(CT_bytes) % AES_block_size == 0)
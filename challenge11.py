@@ -22,36 +22,53 @@ Detect the block cipher mode the function is using each time. You should end up
 
 from challenge_util import *
 
-def encryption_oracle(PT_bytes):
-  random_AES_key = random_bytes(AES_block_size)
-  prepend = random_bytes(random.randint(5,10))
-  append = random_bytes(random.randint(5,10))
+'''
+rng: a random.Random instance for every random choice (default the module-level generator), so trials can be seeded
+'''
+def encryption_oracle(PT_bytes, rng = None):
+  rng = rng or random
+  random_AES_key = random_bytes(AES_block_size, rng)
+  prepend = random_bytes(rng.randint(5,10), rng)
+  append = random_bytes(rng.randint(5,10), rng)
   PT_bytes = pkcs7(prepend + PT_bytes + append)
 
   mode = ""
-  if random.random() < 0.5:
+  if rng.random() < 0.5:
     # Run ECB
     mode = "ECB"
     CT_bytes = ECB_encrypt(PT_bytes, random_AES_key)
   else:
     # Run CBC
     mode = "CBC"
-    random_IV = random_bytes(AES_block_size)
+    random_IV = random_bytes(AES_block_size, rng)
     CT_bytes = CBC_encrypt(PT_bytes, random_AES_key, random_IV)
   return [mode, bytes(CT_bytes)]
 
+'''
+Same as [encryption_oracle(PT_bytes, rng) for PT_bytes in PT_list], random choices drawn in the same order
+Every message has its own fresh key, so unlike challenge12/14 there is no cipher object to share between them
+'''
+def encryption_oracle_many(PT_list, rng = None):
+  return [encryption_oracle(PT_bytes, rng) for PT_bytes in PT_list]
+
+'''
+One oracle query and one guess. Returns (actual mode, guessed mode)
+Also the trial function for monte_carlo: python3 monte_carlo.py challenge11:trial <number of trials>
+'''
+def trial(rng = None):
+  PT_bytes = codecs.encode("A"*100)
+  mode, CT_bytes = encryption_oracle(PT_bytes, rng)
+  guess = None
+  if not detect_ECB(CT_bytes):
+    guess = "CBC"
+  else:
+    guess = "ECB"
+  return mode, guess
+
 def detect(num_tests):
   num_correct = 0
   for i in range(num_tests):
-    PT_bytes = codecs.encode("A"*100)
-    mode, CT_bytes = encryption_oracle(PT_bytes)
-    repeated_chunks = find_repeated_chunks(CT_bytes)
-
-    guess = None
-    if len(repeated_chunks) == 0:
-      guess = "CBC"
-    else:
-      guess = "ECB"
+    mode, guess = trial()
     if mode == guess:
       num_correct += 1
     print("Test {0:3} || Guess: {1} | Ans: {2}".format(i+1, guess, mode))
@@ -41,12 +41,20 @@ This is the first challenge we've given you whose solution will break real crypt
 '''
 
 from challenge_util import *
+import byte_at_a_time
+
+append = codecs.decode(codecs.encode("Um9sbGluJyBpbiBteSA1LjAKV2l0aCBteSByYWctdG9wIGRvd24gc28gbXkgaGFpciBjYW4gYmxvdwpUaGUgZ2lybGllcyBvbiBzdGFuZGJ5IHdhdmluZyBqdXN0IHRvIHNheSBoaQpEaWQgeW91IHN0b3A/IE5vLCBJIGp1c3QgZHJvdmUgYnkK"), "base64")
 
 def encryption_oracle(PT_bytes, AES_key):
-  append = codecs.decode(codecs.encode("Um9sbGluJyBpbiBteSA1LjAKV2l0aCBteSByYWctdG9wIGRvd24gc28gbXkgaGFpciBjYW4gYmxvdwpUaGUgZ2lybGllcyBvbiBzdGFuZGJ5IHdhdmluZyBqdXN0IHRvIHNheSBoaQpEaWQgeW91IHN0b3A/IE5vLCBJIGp1c3QgZHJvdmUgYnkK"), "base64")
   CT_bytes = ECB_encrypt(PT_bytes + append, AES_key)
   return bytes(CT_bytes)
 
+'''
+Same as [encryption_oracle(PT_bytes, AES_key) for PT_bytes in PT_list], padded and encrypted in one ECB call
+'''
+def encryption_oracle_many(PT_list, AES_key):
+  return ECB_encrypt_many([PT_bytes + append for PT_bytes in PT_list], AES_key)
+
 def main():
   # Step 0: Fix unknown random AES key
   random_AES_key = random_bytes(AES_block_size)
@@ -73,24 +81,11 @@ def main():
   
   # Step 3: Craft PT that is one byte short, so that first block "eats" into appended unknown text. Recover the first unknown byte
   # Step 4: Repeat until all bytes recovered
-  solved = bytearray()
-  while len(solved) < unknown_byte_size:
-    offset = block_size - (len(solved) % block_size) - 1
-    PT_bytes = bytearray(codecs.encode("A" * offset))
-    assert((len(PT_bytes) + len(solved) + 1) % block_size == 0)
-  
-    block_idx = (len(PT_bytes) + len(solved) + 1) // block_size - 1
-    CT_bytes = encryption_oracle(PT_bytes, random_AES_key)
-    observation = get_block(CT_bytes, block_idx)
-  
-    # Brute force unknown last byte
-    for i in range(256):
-      to_try = PT_bytes + solved + bytes([i])
-      outcome = get_block(encryption_oracle(to_try, random_AES_key), block_idx)
-      if outcome == observation:
-        solved += bytes([i])
-        break
-  
+  # All 256 guesses for a byte go in one query, next to each other (See byte_at_a_time)
+  solved, queries = byte_at_a_time.recover_target(lambda PT_bytes: encryption_oracle(PT_bytes, random_AES_key), 0, unknown_byte_size,
+                                                  encrypt_many = lambda PT_list: encryption_oracle_many(PT_list, random_AES_key))
+  print("Oracle queries: {0}".format(queries))
+
   # Print the decoded bytes!
   print("Decoded bytes:\n{0}".format(bytes(solved)))
   print()
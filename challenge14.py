@@ -14,6 +14,7 @@ Think "STIMULUS" and "RESPONSE".
 '''
 
 from challenge_util import *
+import byte_at_a_time
 
 class Oracle:
   def __init__(self, random_prefix, target_bytes, random_AES_key):
@@ -26,6 +27,10 @@ class Oracle:
     CT_bytes = ECB_encrypt(PT_bytes, self.key)
     return bytes(CT_bytes)
 
+  # Same as [self.encrypt(PT_bytes) for PT_bytes in PT_list], padded and encrypted in one ECB call
+  def encrypt_many(self, PT_list):
+    return ECB_encrypt_many([self.prefix + PT_bytes + self.target for PT_bytes in PT_list], self.key)
+
 def form_buffer(buffer_len):
   return codecs.encode("A" * buffer_len)
 
@@ -45,18 +50,20 @@ def step1(oracle):
   combined_len = None
   prefix_len = None
   target_len = None
-  init_CT = oracle.encrypt(form_buffer(0))
+  # Every probe goes to the oracle in one batch: CTs[i] is the CT with buffer_len i
+  CTs = oracle.encrypt_many([form_buffer(i) for i in range(AES_block_size + 2)])
+  init_CT = CTs[0]
 
   # Find combined length
   for i in range(AES_block_size):
-    CT_bytes = oracle.encrypt(form_buffer(i))
+    CT_bytes = CTs[i]
     if len(CT_bytes) != len(init_CT):
       combined_len = len(init_CT) - i
       break
 
   # Find changing block
   prev_CT = init_CT
-  next_CT = oracle.encrypt(form_buffer(1))
+  next_CT = CTs[1]
   for i in range(len(prev_CT) // 16):
     if get_block(prev_CT, i) != get_block(next_CT, i):
       change_idx = i
@@ -65,7 +72,7 @@ def step1(oracle):
   # Find prefix_len
   prev_CT = next_CT
   for i in range(2, AES_block_size + 2):
-    next_CT = oracle.encrypt(form_buffer(i))
+    next_CT = CTs[i]
     if get_block(prev_CT, change_idx) == get_block(next_CT, change_idx):
       prefix_len = AES_block_size * (change_idx + 1) - (i - 1)
       break
@@ -75,24 +82,11 @@ def step1(oracle):
   target_len = combined_len - prefix_len
   return prefix_len, target_len
 
-def step3(oracle, prefix_len, target_len, block_offset):
-  solved = bytearray()
-  prepend_len = AES_block_size - (prefix_len % AES_block_size)
-  while len(solved) < target_len:
-    offset_len = AES_block_size - (len(solved) % AES_block_size) - 1
-    PT_bytes = form_buffer(prepend_len + offset_len)
-    CT_bytes = oracle.encrypt(PT_bytes)
-
-    # Brute force unknown last byte
-    block_idx = block_offset + (offset_len + len(solved)) // AES_block_size
-    observation = get_block(CT_bytes, block_idx)  
-    for i in range(256):
-      to_try = PT_bytes + solved + bytes([i])
-      outcome = get_block(oracle.encrypt(to_try), block_idx)
-      if outcome == observation:
-        solved += bytes([i])
-        break
-  return bytes(solved)
+'''
+challenge12's attack, shifted past the prefix (See byte_at_a_time). Returns (solved bytes, number of queries)
+'''
+def step3(oracle, prefix_len, target_len):
+  return byte_at_a_time.recover_target(oracle.encrypt, prefix_len, target_len, encrypt_many = oracle.encrypt_many)
 
 def main(argv):
   # (HIDDEN) Step 0: Setup
@@ -131,9 +125,10 @@ def main(argv):
   print("Target length: {0}".format(target_len))
 
   # Step 3: Reuse challenge12's attack with block offset to account for random_prefix
-  block_offset = prefix_len // AES_block_size + 1
+  pad_len, block_offset = byte_at_a_time.alignment(prefix_len)
   print("Block offset : {0}".format(block_offset))
-  solved = step3(oracle, prefix_len, target_len, block_offset)
+  solved, queries = step3(oracle, prefix_len, target_len)
+  print("Oracle queries: {0}".format(queries))
   
   # SANITY CHECK 
   assert(solved == target_bytes)
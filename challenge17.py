@@ -64,6 +64,7 @@ class Oracle:
     self.secret = codecs.encode(random.choice(secrets))
     self.AES_key = random_bytes(AES_block_size)
     self.IV = random_bytes(AES_block_size)
+    self.PT_buffer = bytearray() # Reused by function2 across queries
     print("Chosen secret:\n{0}".format(self.secret))
     print("Padded secret:\n{0}".format(pkcs7(self.secret)))
 
@@ -71,7 +72,9 @@ class Oracle:
     return self.IV, CBC_encrypt(self.secret, self.AES_key, self.IV)
 
   def function2(self, IV, CT_bytes):
-    PT_bytes = CBC_decrypt(CT_bytes, self.AES_key, IV)
+    if len(self.PT_buffer) != len(CT_bytes):
+      self.PT_buffer = bytearray(len(CT_bytes))
+    PT_bytes = CBC_decrypt(CT_bytes, self.AES_key, IV, self.PT_buffer)
     padding = int(PT_bytes[-1])
     if padding == 0:
       return False
@@ -94,7 +97,8 @@ def padding_attack(oracle, IV, CT_bytes):
       prev_block = IV
     else:
       prev_block = get_block(CT_bytes, block_idx - 1)
-    CT_fragment = prev_block + target_block
+    # One probe buffer per block pair, modified in place for every query
+    CT_fragment = bytearray(prev_block + target_block)
 
     # Initialize guess block with all zeroes
     guess_block = bytearray(AES_block_size)
@@ -103,10 +107,10 @@ def padding_attack(oracle, IV, CT_bytes):
     # Abuse: CBC decryption allows manipulation of 2nd block by modifying 1st block
     pad_len = 1
     while pad_len <= AES_block_size:
-      modification = bytearray(2 * AES_block_size)
+      CT_fragment[:AES_block_size] = prev_block
       for j in range(1, pad_len + 1):
-        modification[-AES_block_size-j] = guess_block[-j] ^ pad_len
-      if oracle.function2(IV, fixed_xor(CT_fragment, modification)):
+        CT_fragment[AES_block_size-j] ^= guess_block[-j] ^ pad_len
+      if oracle.function2(IV, CT_fragment):
         pad_len += 1
       else:
         if guess_block[-pad_len] < 255:
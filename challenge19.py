@@ -69,6 +69,7 @@ Points for automating this, but part of the reason I'm having you do this is tha
 '''
 
 from challenge_util import *
+from ngram_model import NgramModel
 import time
 
 def produce_CT():
@@ -115,23 +116,19 @@ def produce_CT():
   all_PT_bytes = [codecs.decode(codecs.encode(PT), "base64") for PT in all_PT]
   random_AES_key = random_bytes(AES_block_size)
   fixed_nonce = b"\x00\x00\x00\x00\x00\x00\x00\x00"
-  all_CT_bytes = [CTR_encrypt(PT, random_AES_key, fixed_nonce) for PT in all_PT_bytes]
+  # Fixed nonce: every PT is XORed with the same keystream, so generate it once
+  keystream = CTR_keystream(random_AES_key, fixed_nonce, max([len(PT) for PT in all_PT_bytes]))
+  all_CT_bytes = [fixed_xor(PT, keystream[:len(PT)]) for PT in all_PT_bytes]
   return all_PT_bytes, all_CT_bytes
 
 '''
 Parses norvig_freq.txt
 Source: http://norvig.com/mayzner.html
 
-To do: Extend this to account for frequencies instead of equal weightage
+Each n-gram is weighted by its frequency, recovered from its rank (See ngram_model)
 '''
 def setup_freq():
-  counts = dict()
-  with open("norvig_freq.txt", 'r') as fin:
-    for line in fin:
-      line = line.split()
-      for x in line:
-        counts[x] = 1
-  return counts
+  return NgramModel().ngram_weights()
 
 def compute_score(CT_bytes, xor_bytes, xor_indices, counts):
   assert(len(xor_bytes) == len(xor_indices))
@@ -14,28 +14,22 @@ Solve the resulting concatenation of ciphertexts as if for repeating- key XOR, w
 '''
 
 from challenge_util import *
+from ngram_model import NgramModel
 
 def produce_CT():
   all_PT_bytes = read_challenge("challenge20.txt", "base64", True)
   random_AES_key = random_bytes(AES_block_size)
   fixed_nonce = b"\x00\x00\x00\x00\x00\x00\x00\x00"
-  all_CT_bytes = [CTR_encrypt(PT, random_AES_key, fixed_nonce) for PT in all_PT_bytes]
+  # Fixed nonce: every PT is XORed with the same keystream, so generate it once
+  keystream = CTR_keystream(random_AES_key, fixed_nonce, max([len(PT) for PT in all_PT_bytes]))
+  all_CT_bytes = [fixed_xor(PT, keystream[:len(PT)]) for PT in all_PT_bytes]
   return all_PT_bytes, all_CT_bytes
 
 '''
 Modified from challenge3
 '''
 def guess_xor_byte(CT_bytes, score_set):
-  best_score = -1
-  best_xor = None
-  for b in range(2 ** 8): # Try all single characters in a byte
-    PT = bytearray()
-    for i in range(len(CT_bytes)):
-      PT.append(CT_bytes[i] ^ b)
-    score = score_string(PT, score_set)
-    if score >= best_score:
-      best_score = score
-      best_xor = b
+  score, best_xor = rank_xor_keys(CT_bytes, score_set)[0]
   return best_xor
 
 '''
@@ -52,9 +46,11 @@ def modified_repeating_XOR_attack(all_CT_bytes):
     transposed_chunks.append(transposed)
   
   # For each column, find most likely xor stream from CTR output
+  # Columns are short, so score with letter frequencies rather than just counting letters
+  model = NgramModel()
   xor_stream = bytearray()
   for i in range(xor_len):
-    xor_byte = guess_xor_byte(transposed_chunks[i], ascii_letterspaces)
+    xor_byte = guess_xor_byte(transposed_chunks[i], model)
     xor_stream.append(xor_byte)
 
   # Decode according to most likely xor stream
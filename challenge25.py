@@ -21,21 +21,26 @@ from challenge_util import *
 '''
 Replace offset chunk by encrypted newtext
 Note: Extends ciphertext if newtext longer than replacement
+CTR encrypts byte i with keystream byte i alone, so only the counter blocks overlapping
+[offset, offset + len(newtext)) are generated, and the cost depends on len(newtext) only
+A bytearray, mmap or writable memoryview is patched in place and returned
+Only bytes and bytearrays can grow: an edit past the end of any other buffer raises ValueError
+bytes are immutable, so they are copied into a new bytearray first and bytes are returned
 '''
 def edit(CT_bytes, key_bytes, nonce_bytes, offset, newtext):
-  PT_bytes = CTR_decrypt(CT_bytes, key_bytes, nonce_bytes)
-  PT_prepend = PT_bytes[:offset]
-  PT_append = PT_bytes[offset + len(newtext):]
-  PT_bytes = PT_prepend + newtext + PT_append
-
-  ctr = 0
-  keystream = bytearray()
-  while len(keystream) < len(PT_bytes):
-    msg = nonce_bytes + ctr.to_bytes(8, "little")
-    keystream += lib_ECB_encrypt(msg, key_bytes)
-    ctr += 1
-  CT_bytes = fixed_xor(PT_bytes, keystream[:len(PT_bytes)])
-  return bytes(CT_bytes)
+  assert(0 <= offset <= len(CT_bytes))
+  immutable = isinstance(CT_bytes, bytes)
+  if immutable:
+    CT_bytes = bytearray(CT_bytes)
+  end = offset + len(newtext)
+  if end > len(CT_bytes):
+    if not isinstance(CT_bytes, bytearray):
+      raise ValueError("Edit of [{0}, {1}) goes past the end of a {2}-byte {3}, which cannot grow".format(
+        offset, end, len(CT_bytes), type(CT_bytes).__name__))
+    # The new tail is entirely overwritten below
+    CT_bytes.extend(bytes(end - len(CT_bytes)))
+  CTR_encrypt(newtext, key_bytes, nonce_bytes, offset, out = as_view(CT_bytes)[offset:end])
+  return bytes(CT_bytes) if immutable else CT_bytes
 
 def main():
   file_bytes = read_challenge("challenge25.txt", "base64")
@@ -47,9 +52,9 @@ def main():
 
   # Idea: CTR_encrypt(zeroes) = keystream
   # Run edit(..., zeroes) to extract keystream, then xor with CT to recover PT
-  mod_bytes = CT_bytes
+  mod_bytes = bytearray(CT_bytes)
   zeroes = b"\x00" * len(CT_bytes)
-  mod_bytes = edit(mod_bytes, unknown_CTR_key, unknown_nonce, 0, zeroes)
+  edit(mod_bytes, unknown_CTR_key, unknown_nonce, 0, zeroes)
   recovered_bytes = fixed_xor(CT_bytes, mod_bytes[:len(CT_bytes)])
 
   print("Recovered:")
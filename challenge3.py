@@ -15,28 +15,12 @@ You now have our permission to make "ETAOIN SHRDLU" jokes on Twitter.
 '''
 
 import codecs
-
-def score_string(s, score_set):
-  score = 0
-  for i in range(len(s)):
-    if s[i] in score_set:
-      score += 1
-  return score
+from challenge_util import rank_xor_keys
 
 def challenge3(CT_bytes, score_set):
-  best_score = -1
-  best_PT = None
-  best_key = None
-  for key in range(2 ** 8): # Try all single characters in a byte
-    PT = bytearray()
-    for i in range(len(CT_bytes)):
-      PT.append(CT_bytes[i] ^ key)
-    score = score_string(PT, score_set)
-    if score >= best_score:
-      best_score = score
-      best_PT = PT
-      best_key = key
-  return (bytes(best_PT), best_score, best_key)
+  best_score, best_key = rank_xor_keys(CT_bytes, score_set)[0]
+  best_PT = bytes([c ^ best_key for c in CT_bytes])
+  return (best_PT, best_score, best_key)
 
 
 def main():
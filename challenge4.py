@@ -10,7 +10,7 @@ Find it.
 '''
 
 import codecs
-from challenge3 import challenge3
+from challenge_util import rank_xor_keys
 
 def challenge4(filename, score_set):
   CT = []
@@ -20,16 +20,18 @@ def challenge4(filename, score_set):
   print("{0} contains {1} candidate ciphertexts".format(filename, len(CT)))
 
   best_score = -1
-  best_PT = None
+  best_key = None
   best_line_idx = None
   for i in range(len(CT)):
     CT_bytes = codecs.decode(CT[i], "hex")
-    PT_bytes, score, key = challenge3(CT_bytes, score_set)
+    score, key = rank_xor_keys(CT_bytes, score_set)[0]
     if score >= best_score:
       best_score = score
-      best_PT = PT_bytes
+      best_key = key
       best_line_idx = i
+  # Decode only the winning line
   # Note: best_line_idx is 0 based
+  best_PT = bytes([c ^ best_key for c in codecs.decode(CT[best_line_idx], "hex")])
   return (best_line_idx + 1, best_score, CT[best_line_idx], best_PT)
 
 def main():
@@ -19,12 +19,7 @@ Encrypt a bunch of stuff using your repeating-key XOR function. Encrypt your mai
 '''
 
 import codecs
-
-def repeated_xor(key, x):
-  xored = bytearray()
-  for i in range(len(x)):
-    xored.append(x[i] ^ key[i % len(key)])
-  return bytes(xored)
+from challenge_util import repeated_xor
 
 def main():
   key = b'ICE'
@@ -39,74 +39,92 @@ We get more tech support questions for this challenge than any of the other ones
 
 import codecs
 import sys
-from challenge3 import challenge3
+from challenge_util import rank_xor_keys, read_challenge
 from challenge5 import repeated_xor
-
-# Count number of 1's in (x XOR y)
-# x and y are in bytes
-def hamming(x, y):
-  assert(len(x) == len(y))
-  count = 0
-  for i in range(len(x)):
-    xored = x[i] ^ y[i]
-    xored_bin = bin(xored)[1:]
-    for j in range(len(xored_bin)):
-      if xored_bin[j] == "1":
-        count += 1
-  return count
+from hamming import hamming, hamming_matrix, hamming_shifts
+from key_enum import is_printable, search_key
 
 def test_hamming():
   x1 = codecs.encode("this is a test")
   x2 = codecs.encode("wokka wokka!!!")
   assert(hamming(x1, x2) == 37)
 
-def read_challenge(filename, encoding):
-  CT = ""
-  with open(filename, 'r') as fin:
-    for line in fin:
-      CT += line
-  if encoding == "ascii":
-    return codecs.encode(CT)
-  else:
-    return codecs.decode(codecs.encode(CT), encoding)
-
 # Rank key sizes k in [lb, lb+1, ..., ub] in ascending "normalized edit distance"
 # "normalized edit distance" for a given k =
 #   sum over hamming(A,B)/k for every pairwise bytes A and B (in the first "groupsize" bytes)
+# If groupsize = None, use the whole CT instead:
+#   average distance per byte between every byte and the byte k further on (consecutive k byte blocks, the last one partial)
+#   The sum is the distance between CT and CT shifted by k, and hamming_shifts gives it for every k in one pass
+#   Only k up to len(CT_bytes) // 2 (at least two blocks) are ranked
 def rank_keylengths(CT_bytes, lb, ub, groupsize):
   key_lengths = []
+  if groupsize is None:
+    n = len(CT_bytes)
+    ub = min(ub, n // 2)
+    if ub < lb:
+      return key_lengths
+    distances = hamming_shifts(CT_bytes, ub)
+    return sorted((int(distances[k]) / (n - k), k) for k in range(lb, ub+1))
   for k in range(lb, ub+1):
     groups = []
     for i in range(groupsize):
       groups.append(CT_bytes[i*k : (i+1)*k])
+    distances = hamming_matrix(groups)
     score = 0
     for i in range(groupsize):
       for j in range(i+1, groupsize):
-        score += hamming(groups[i], groups[j])
+        score += distances[i][j]
     score = score / k
     key_lengths.append((score, k))
   key_lengths = sorted(key_lengths)
   return key_lengths
 
+# Pick the key length from a ranking, with a confidence margin in [0, 1]
+# Multiples of the key length score about as well as the key length itself (especially with groupsize = None and large ub),
+# so take the smallest divisor of the top key length that scores close to it
+# Margin = relative gap between its score and the best score of a key length that is not one of its multiples
+# A divisor is close when its score is within divisor_tolerance of the way from the best score to the median:
+# multiples of the key length score near the best, wrong key lengths near the median
+divisor_tolerance = 0.25
+
+def best_keylength(keylength_ranking):
+  scores = dict((kl, score) for score, kl in keylength_ranking)
+  best_score, best_kl = keylength_ranking[0]
+  median_score = keylength_ranking[len(keylength_ranking) // 2][0]
+  close = (median_score - best_score) * divisor_tolerance
+  keylength = min(d for d in scores if best_kl % d == 0 and scores[d] <= best_score + close)
+  for score, kl in keylength_ranking:
+    if kl % keylength != 0:
+      return keylength, ((score - scores[keylength]) / score if score > 0 else 0)
+  return keylength, 1
+
 # ned = "normalized edit distance"
 # search from most promising key lengths, up to bestKL lengths
 # for each key length, search for best byte key
-def test_keylengths(CT_bytes, keylength_ranking, score_set, bestKL):
+# If validator is given, instead enumerate keys in joint likelihood order from the top_k bytes of each column
+# (up to max_keys keys, see key_enum) and keep the first one whose decoding validator accepts
+# Key lengths where no key is accepted are left out of the output
+def test_keylengths(CT_bytes, keylength_ranking, score_set, bestKL, validator = None, top_k = 4, max_keys = 1 << 12):
   output = []
   for kl in range(min(len(keylength_ranking), bestKL)):
     ned, keylength = keylength_ranking[kl]
 
-    # Chunk up CT in keylength
+    if validator is not None:
+      found = search_key(CT_bytes, keylength, score_set, validator, top_k, max_keys)
+      if found is not None:
+        best_key, PT_bytes = found
+        output.append((keylength, bytearray(best_key), PT_bytes))
+      continue
+
+    # Chunk up CT in keylength (strided slices, no per-byte Python loop)
     transposed_chunks = []
     for i in range(keylength):
-      transposed_chunks.append([])
-    for i in range(len(CT_bytes)):
-      transposed_chunks[i % keylength].append(CT_bytes[i])
+      transposed_chunks.append(CT_bytes[i::keylength])
 
     # For each column, find the best byte key
     best_key = bytearray()
     for i in range(keylength):
-      PT_bytes, score, key = challenge3(transposed_chunks[i], score_set)
+      score, key = rank_xor_keys(transposed_chunks[i], score_set)[0]
       best_key.append(key)
 
     # Decode according to best key
@@ -122,7 +140,7 @@ def main(argv):
   # Parse parameters, or use default
   lowerbound = 2
   upperbound = 40
-  groupsize  = 4
+  groupsize  = None # Compare every consecutive pair of blocks in the whole CT
   if len(argv) >= 2:
     bestKL = int(argv[1])
   else:
@@ -131,7 +149,12 @@ def main(argv):
   test_hamming()
   CT_bytes = read_challenge("challenge6.txt", "base64")
   keylength_ranking = rank_keylengths(CT_bytes, lowerbound, upperbound, groupsize)
-  guesses = test_keylengths(CT_bytes, keylength_ranking, ascii_letterspaces, bestKL)
+
+  # Try the chosen key length first
+  keylength, margin = best_keylength(keylength_ranking)
+  print("Most likely key length: {0} (confidence margin {1:.3f})".format(keylength, margin))
+  keylength_ranking = sorted(keylength_ranking, key = lambda x: x[1] != keylength)
+  guesses = test_keylengths(CT_bytes, keylength_ranking, ascii_letterspaces, bestKL, validator = is_printable)
 
   for keylength, best_key, PT_bytes in guesses:
     print("Best key of length {0}: {1}".format(keylength, best_key))
@@ -15,13 +15,13 @@ You can obviously decrypt this using the OpenSSL command-line tool, but we're ha
 '''
 
 import codecs
-from Crypto.Cipher import AES
+import aes_backend
 from challenge6 import read_challenge
 
 def main():
   CT_bytes = read_challenge("challenge7.txt", "base64") 
   key = codecs.encode("YELLOW SUBMARINE")
-  cipher = AES.new(key, AES.MODE_ECB)
+  cipher = aes_backend.get_backend().new(key)
   PT_bytes = cipher.decrypt(CT_bytes)
   print("Decoded:\n{0}".format(PT_bytes))
   print()
@@ -12,29 +12,7 @@ Remember that the problem with ECB is that it is stateless and deterministic; th
 '''
 
 import codecs
-from Crypto.Cipher import AES
-
-def read_challenge(filename, encoding, multiline = False):
-  if multiline:
-    CT = []
-    with open(filename, 'r') as fin:
-      for line in fin:
-        CT.append(line[:-1]) # Ignore trailing "\n"    
-  else:
-    CT = ""
-    with open(filename, 'r') as fin:
-      for line in fin:
-        CT += line
-  if encoding == "ascii":
-    if multiline:
-      return [codecs.encode(ct) for ct in CT]
-    else:
-      return codecs.encode(CT)
-  else:
-    if multiline:
-      return [codecs.decode(codecs.encode(ct), encoding) for ct in CT]
-    else:
-      return codecs.decode(codecs.encode(CT), encoding)
+from challenge_util import find_repeated_chunks, read_challenge
 
 def get_block(x, idx, block_size):
   assert(len(x) >= idx * block_size)
@@ -46,16 +24,9 @@ def detect_AES_ECB(CT_bytes):
   for line_idx in range(len(CT_bytes)):
     ctb = CT_bytes[line_idx]
     assert(len(ctb) % AES_block_size == 0)
-    num_bytes = len(ctb) // 16
 
-    # Check for repeating ciphertext bytes
-    same = []
-    for i in range(num_bytes):
-      for j in range(i+1, num_bytes):
-        x = get_block(ctb, i, AES_block_size)
-        y = get_block(ctb, j, AES_block_size)
-        if x == y:
-          same.append((i,j))
+    # Check for repeating ciphertext bytes, in one pass over the blocks (See challenge_util)
+    same = find_repeated_chunks(ctb)
 
     # Record lines that have repeated bytes
     # Note: line_idx is 0-based
@@ -16,7 +16,6 @@ So: pad any block to a specific block length, by appending the number of bytes o
 
 import codecs
 import sys
-from Crypto.Cipher import AES
 
 # x is in bytes
 def pkcs7(x, block_size):
@@ -3,30 +3,79 @@ Frequently used things in challenges
 Will be added over time as I progress through the challenges
 '''
 
+import binascii
 import codecs
+import mmap
 import random
 import sys
+import threading
 import time
-from Crypto.Cipher import AES
+from collections import Counter, OrderedDict
+import aes_backend
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
 
 #
 # Constants
 #
 ascii_letterspaces = set(list(range(65, 91)) + list(range(97, 123)) + [32])
 AES_block_size = 16
+numpy_xor_threshold = 1 << 12 # Below this, big integer XOR beats NumPy call overhead
+read_chunk_size = 1 << 20 # Bytes of encoded file decoded per step in read_challenge
+cipher_cache_size = 256 # Number of AES key schedules kept ready by cipher_cache
+numpy_repeat_threshold = 1 << 12 # Blocks; above this, sorting with NumPy beats a dict of block bytes
+out_copy_threshold = 1 << 10 # Bytes; below this, decrypting to new bytes and copying into out beats the in-place path
 
 #
 # Functions
 #
+'''
+XOR engine shared by fixed_xor and repeated_xor
+Whole buffers are XORed at once: as big integers, or via NumPy (when available) for large buffers
+If out is given (any writable buffer of the right length), the result is written into it and out is returned
+'''
+def _xor_into(b1, b2, out):
+  n = len(b1)
+  if np is not None and n >= numpy_xor_threshold:
+    out_arr = np.empty(n, dtype = np.uint8) if out is None else np.frombuffer(out, dtype = np.uint8, count = n)
+    np.bitwise_xor(np.frombuffer(b1, dtype = np.uint8, count = n),
+                   np.frombuffer(b2, dtype = np.uint8, count = n),
+                   out = out_arr)
+    return out_arr.tobytes() if out is None else out
+  xored = (int.from_bytes(b1, "little") ^ int.from_bytes(b2, "little")).to_bytes(n, "little")
+  if out is None:
+    return xored
+  out[:n] = xored
+  return out
+
 '''
 Given 2 same length bytes, return their XOR
 '''
-def fixed_xor(b1, b2):
+def fixed_xor(b1, b2, out = None):
   assert(len(b1) == len(b2))
-  xored = bytearray()
-  for i in range(len(b1)):
-    xored.append(b1[i] ^ b2[i])
-  return bytes(xored)
+  return _xor_into(b1, b2, out)
+
+'''
+Given bytes x, return x XORed with key repeated over its whole length (See challenge5)
+'''
+def repeated_xor(key, x, out = None):
+  if len(x) == 0:
+    return b"" if out is None else out
+  if np is not None and len(x) >= numpy_xor_threshold:
+    k = len(key)
+    full = len(x) - len(x) % k
+    x_arr = np.frombuffer(x, dtype = np.uint8)
+    key_arr = np.frombuffer(key, dtype = np.uint8)
+    out_arr = np.empty(len(x), dtype = np.uint8) if out is None else np.frombuffer(out, dtype = np.uint8, count = len(x))
+    # Broadcast key over every full row, then handle the tail
+    np.bitwise_xor(x_arr[:full].reshape(-1, k), key_arr, out = out_arr[:full].reshape(-1, k))
+    np.bitwise_xor(x_arr[full:], key_arr[:len(x) - full], out = out_arr[full:])
+    return out_arr.tobytes() if out is None else out
+  keystream = (bytes(key) * (len(x) // len(key) + 1))[:len(x)]
+  return _xor_into(x, keystream, out)
 
 '''
 Returns number of characters in s that matches a given scoring set
@@ -39,49 +88,163 @@ def score_string(s, score_set):
   return score
 
 '''
-Returns file content in bytes
+Returns the score of each of the 256 byte values
+score_set is either a set of bytes (each scores 1) or a model with a byte_logp table (See ngram_model)
+'''
+def byte_weights(score_set):
+  weights = getattr(score_set, "byte_logp", None)
+  if weights is None:
+    weights = [1 if b in score_set else 0 for b in range(256)]
+  return weights
+
+'''
+Returns a 256 x 256 table where table[key][c] is the score of plaintext byte c ^ key
+Only depends on score_set, so it is built once per score_set and cached
+'''
+_xor_key_tables = dict()
+def xor_key_table(score_set):
+  cache_key = score_set if hasattr(score_set, "byte_logp") else frozenset(score_set)
+  if cache_key not in _xor_key_tables:
+    weights = byte_weights(score_set)
+    _xor_key_tables[cache_key] = [[weights[c ^ key] for c in range(256)] for key in range(256)]
+  return _xor_key_tables[cache_key]
+
+'''
+Score all 256 single-byte XOR keys of CT_bytes in O(n + 256^2)
+XOR with a single byte only permutes byte values, so score_string(CT ^ key) is
+the histogram of CT_bytes weighted by the key's row of xor_key_table
+Returns [(score, key), ...] from best to worst. Ties are broken towards the larger key (as in challenge3)
+'''
+def rank_xor_keys(CT_bytes, score_set):
+  table = xor_key_table(score_set)
+  histogram = list(Counter(CT_bytes).items())
+  scores = []
+  for key in range(256):
+    row = table[key]
+    scores.append((sum(count * row[c] for c, count in histogram), key))
+  return sorted(scores, reverse = True)
+
+'''
+Decoders from encoded bytes (whitespace already removed) to raw bytes
+Each is given input whose length is a multiple of its alignment
+'''
+_decoders = { # encoding: (decoder, characters per unit, bytes per decoded unit)
+  "base64": (binascii.a2b_base64, 4, 3),
+  "hex": (binascii.a2b_hex, 2, 1),
+}
+_whitespace = b" \t\r\n\v\f"
+
+def _decode(data, encoding):
+  if encoding == "ascii":
+    return bytes(data)
+  if encoding in _decoders:
+    return _decoders[encoding][0](bytes(data).translate(None, _whitespace))
+  return codecs.decode(bytes(data), encoding)
+
+'''
+Memory-maps filename, returning None for an empty file (which cannot be mapped)
+'''
+def _map_challenge(filename):
+  with open(filename, 'rb') as fin:
+    if fin.seek(0, 2) == 0:
+      return None
+    return mmap.mmap(fin.fileno(), 0, access = mmap.ACCESS_READ)
+
+'''
+Yields each line of the file (without trailing "\n") decoded to bytes, one line at a time
+'''
+def iter_challenge(filename, encoding):
+  mm = _map_challenge(filename)
+  if mm is None:
+    return
+  with mm:
+    start = 0
+    while start < len(mm):
+      end = mm.find(b"\n", start)
+      if end == -1:
+        end = len(mm)
+      yield _decode(mm[start:end], encoding)
+      start = end + 1
+
+'''
+Decode the whole file in chunks of about read_chunk_size, each trimmed to the encoding's alignment
+(whitespace does not count towards alignment, the leftover is carried into the next chunk)
+Each chunk is decoded into one bytearray sized from the file length (an upper bound, as whitespace only
+shrinks the output), trimmed once at the end, so the peak is the output plus one chunk. Returns the bytearray
+'''
+def _decode_chunks(mm, encoding):
+  decoder, alignment, unit = _decoders[encoding]
+  out = bytearray((len(mm) // alignment + 1) * unit)
+  n = 0
+  carry = b""
+  for pos in range(0, len(mm), read_chunk_size):
+    data = carry + mm[pos : pos + read_chunk_size].translate(None, _whitespace)
+    # Base64 decoding stops at the first complete padded quad, as when decoding the file in one go
+    pad = data.find(b"=") if encoding == "base64" else -1
+    if pad != -1 and (pad // 4 + 1) * 4 <= len(data):
+      carry = data[: (pad // 4 + 1) * 4]
+      break
+    aligned = len(data) - len(data) % alignment
+    decoded = decoder(data[:aligned])
+    out[n : n + len(decoded)] = decoded
+    n += len(decoded)
+    carry = data[aligned:]
+  decoded = decoder(carry)
+  out[n : n + len(decoded)] = decoded
+  del out[n + len(decoded):]
+  return out
+
+'''
+Returns file content in bytes (a bytearray for hex and base64, decoded in place, see _decode_chunks)
 If multiline = True, then return an array of bytes with each line as an element
+The file is memory-mapped and decoded incrementally, so loading is linear in the file size
 '''
 def read_challenge(filename, encoding, multiline = False):
   if multiline:
-    CT = []
-    with open(filename, 'r') as fin:
-      for line in fin:
-        CT.append(line[:-1]) # Ignore trailing "\n"    
-  else:
-    CT = ""
-    with open(filename, 'r') as fin:
-      for line in fin:
-        CT += line
-  if encoding == "ascii":
-    if multiline:
-      return [codecs.encode(ct) for ct in CT]
-    else:
-      return codecs.encode(CT)
-  else:
-    if multiline:
-      return [codecs.decode(codecs.encode(ct), encoding) for ct in CT]
-    else:
-      return codecs.decode(codecs.encode(CT), encoding)
+    return list(iter_challenge(filename, encoding))
+  mm = _map_challenge(filename)
+  if mm is None:
+    return b""
+  with mm:
+    if encoding in _decoders:
+      return _decode_chunks(mm, encoding)
+    return _decode(mm[:], encoding)
+
+'''
+Byte-level memoryview over any buffer (bytes, bytearray, mmap, array, NumPy array, ...), without copying
+'''
+def as_view(x):
+  view = x if isinstance(x, memoryview) else memoryview(x)
+  return view if view.format == "B" and view.ndim == 1 else view.cast("B")
 
 '''
-Return the idx-th block of bytes x
+Return the idx-th block of x
+bytes and bytearray give a copy as before; any other buffer gives a memoryview into it
 Assume block_size = AES_block_size unless otherwise stated
 '''
 def get_block(x, idx, block_size = AES_block_size):
+  if not isinstance(x, (bytes, bytearray)):
+    x = as_view(x)
   assert(len(x) >= idx * block_size)
   return x[idx * block_size : (idx+1) * block_size]
 
+'''
+Yields memoryviews of the consecutive blocks of x (the last one is short if len(x) is not a multiple of block_size)
+Nothing is copied: the views point into x, so they see later writes to x
+'''
+def iter_blocks(x, block_size = AES_block_size):
+  view = as_view(x)
+  for start in range(0, len(view), block_size):
+    yield view[start : start + block_size]
+
 '''
 Given bytes x, return PKCS7 padded version of it
 Assume block_size = AES_block_size unless otherwise stated
 '''
 def pkcs7(x, block_size = AES_block_size):
   pad_length = block_size - (len(x) % block_size)
-  padded_x = bytearray(x)
-  for i in range(pad_length):
-    padded_x.append(pad_length)
-  return bytes(padded_x)
+  # One allocation for the result, whatever buffer x is
+  return b"".join([x, bytes([pad_length]) * pad_length])
 
 '''
 AES encryption/decryption via ECB and CBC modes
@@ -89,97 +252,317 @@ lib_ECB: From library
 ECB: ECB mode with padding handling
 CBC: CBC mode written from scratch using _ECB as black box (See challenge10)
 '''
-def lib_ECB_decrypt(CT_bytes, key_bytes):
-  cipher = AES.new(key_bytes, AES.MODE_ECB)
-  PT_bytes = cipher.decrypt(CT_bytes)
-  return PT_bytes
+'''
+Bounded LRU cache of ready AES ECB cipher objects, keyed by key bytes
+Building a cipher object (key expansion included) costs more than encrypting a few blocks with it,
+and ECB cipher objects hold no per-message state, so one object per key can be reused by every call
+The cache itself is safe to use from threads; hits, misses and evictions are counted
+Cipher objects are shared between threads too: every backend's object either keeps no per-call state,
+or (cryptography) keeps its stateful contexts per thread (See aes_backend.CryptographyECB)
+'''
+class CipherCache:
+  def __init__(self, maxsize = cipher_cache_size):
+    self.maxsize = maxsize
+    self.ciphers = OrderedDict()
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  # Return the cipher object for key_bytes, building it on a miss
+  def get(self, key_bytes):
+    key_bytes = bytes(key_bytes)
+    with self.lock:
+      cipher = self.ciphers.get(key_bytes)
+      if cipher is not None:
+        self.ciphers.move_to_end(key_bytes)
+        self.hits += 1
+        return cipher
+      self.misses += 1
+    # Build outside the lock; if two threads race on the same key, both objects are equivalent
+    cipher = aes_backend.get_backend().new(key_bytes)
+    with self.lock:
+      self.ciphers[key_bytes] = cipher
+      self.ciphers.move_to_end(key_bytes)
+      while len(self.ciphers) > self.maxsize:
+        self.ciphers.popitem(last = False)
+        self.evictions += 1
+    return cipher
+
+  # Drop every cipher object and reset the counters
+  def clear(self):
+    with self.lock:
+      self.ciphers.clear()
+      self.hits = 0
+      self.misses = 0
+      self.evictions = 0
+
+  def stats(self):
+    with self.lock:
+      return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.ciphers)}
+
+cipher_cache = CipherCache()
+
+# Switch the AES backend behind every helper (None: back to AES_BACKEND / the tuned choice, see aes_backend)
+# Cipher objects built by the previous backend are dropped
+def use_backend(name):
+  backend = aes_backend.set_backend(name)
+  cipher_cache.clear()
+  return backend
+
+'''
+ECB through the cached cipher object. If out is given (a writable buffer of at least the input length),
+the result is written into it and out is returned, so the caller can reuse one buffer across calls
+'''
+def _lib_ECB(crypt, data, out):
+  if out is None:
+    return crypt(data)
+  view = as_view(out)[:len(data)]
+  if aes_backend.get_backend().output:
+    crypt(data, output = view)
+  else:
+    view[:] = crypt(data)
+  return out
+
+def lib_ECB_decrypt(CT_bytes, key_bytes, out = None):
+  return _lib_ECB(cipher_cache.get(key_bytes).decrypt, CT_bytes, out)
 
-def lib_ECB_encrypt(PT_bytes, key_bytes):
-  cipher = AES.new(key_bytes, AES.MODE_ECB)
-  CT_bytes = cipher.encrypt(PT_bytes)
-  return bytes(CT_bytes)
+def lib_ECB_encrypt(PT_bytes, key_bytes, out = None):
+  return _lib_ECB(cipher_cache.get(key_bytes).encrypt, PT_bytes, out)
+
+# Whether buffers a and b may share memory (an immutable bytes object never shares with a writable out,
+# and two different bytearrays each own their memory). Checked without NumPy first, as it runs once per call
+# Without NumPy there is no way to tell for other buffers, so any other pair is assumed to overlap
+def _may_overlap(a, b):
+  if a is b:
+    return True
+  if isinstance(a, bytes) or isinstance(b, bytes) or (isinstance(a, bytearray) and isinstance(b, bytearray)):
+    return False
+  if np is None:
+    return True
+  return np.may_share_memory(np.frombuffer(a, dtype = np.uint8), np.frombuffer(b, dtype = np.uint8))
 
 # Remove padding
-def ECB_decrypt(CT_bytes, key_bytes):
-  PT_bytes = lib_ECB_decrypt(CT_bytes, key_bytes)
+# Returns bytes, or with out: the plaintext is decrypted into out and a memoryview of out without the padding is returned
+# out may be CT_bytes itself (each block only depends on its own CT block)
+def ECB_decrypt(CT_bytes, key_bytes, out = None):
+  PT_bytes = lib_ECB_decrypt(CT_bytes, key_bytes, out)
+  if out is not None:
+    PT_bytes = as_view(out)[:len(CT_bytes)]
   padded = int(PT_bytes[-1])
-  return bytes(PT_bytes[:-padded])
+  return PT_bytes[:-padded]
 
 # pkcs7
-def ECB_encrypt(PT_bytes, key_bytes):
+def ECB_encrypt(PT_bytes, key_bytes, out = None):
   PT_bytes = pkcs7(PT_bytes)
   assert(len(PT_bytes) % AES_block_size == 0)
-  return lib_ECB_encrypt(PT_bytes, key_bytes)
+  return lib_ECB_encrypt(PT_bytes, key_bytes, out)
 
-def CBC_decrypt(CT_bytes, key_bytes, IV):
+# P_i = D(C_i) XOR C_{i-1} only depends on the CT, so decrypt every block in one ECB call
+# and XOR against the CT shifted by one block (with IV as C_{-1})
+# Returns bytes, or with out: out itself, holding the plaintext with its padding
+# With out, the XOR is done in place in out, against views of IV and CT_bytes, so nothing else is allocated
+# unless out may overlap CT_bytes (e.g. decrypting in place): then C_0 .. C_{n-2} are copied aside before the ECB pass
+# Below out_copy_threshold bytes, the plaintext is decrypted to new bytes and copied into out instead
+def CBC_decrypt(CT_bytes, key_bytes, IV, out = None):
   assert(len(CT_bytes) % AES_block_size == 0)
-  PT_bytes = bytearray()
-  CT_block = IV
-  for i in range(len(CT_bytes) // AES_block_size):
-    PT_bytes += fixed_xor(CT_block, lib_ECB_decrypt(get_block(CT_bytes, i), key_bytes))
-    CT_block = get_block(CT_bytes, i)
-  return bytes(PT_bytes)
+  if len(CT_bytes) == 0:
+    return b"" if out is None else out
+  if out is None:
+    decrypted = lib_ECB_decrypt(CT_bytes, key_bytes)
+    return fixed_xor(decrypted, bytes(IV) + CT_bytes[:-AES_block_size])
+  n = len(CT_bytes)
+  if n < out_copy_threshold:
+    # Small inputs (e.g. padding oracle queries): the view and overlap bookkeeping costs more than the copy
+    as_view(out)[:n] = CBC_decrypt(CT_bytes, key_bytes, IV)
+    return out
+  IV = bytes(IV)
+  chain = as_view(CT_bytes)[:n - AES_block_size]
+  if _may_overlap(CT_bytes, out):
+    chain = bytes(chain)
+  lib_ECB_decrypt(CT_bytes, key_bytes, out)
+  view = as_view(out)
+  fixed_xor(view[:AES_block_size], IV, view[:AES_block_size])
+  fixed_xor(view[AES_block_size:n], chain, view[AES_block_size:n])
+  return out
+
+# ECB_encrypt of many independent messages under one key: every message is padded into one buffer
+# and the whole buffer goes through one ECB call, then the CT is cut back at the message boundaries
+def ECB_encrypt_many(PT_list, key_bytes):
+  parts = []
+  ends = []
+  end = 0
+  for PT_bytes in PT_list:
+    pad_length = AES_block_size - (len(PT_bytes) % AES_block_size)
+    parts.append(PT_bytes)
+    parts.append(bytes([pad_length]) * pad_length)
+    end += len(PT_bytes) + pad_length
+    ends.append(end)
+  CT_bytes = lib_ECB_encrypt(b"".join(parts), key_bytes)
+  return [CT_bytes[start:end] for start, end in zip([0] + ends, ends)]
 
-def CBC_encrypt(PT_bytes, key_bytes, IV):
+# Each CT block is encrypted straight into its place in the output, through one reused XOR buffer
+def CBC_encrypt(PT_bytes, key_bytes, IV, out = None):
   PT_bytes = pkcs7(PT_bytes)
   assert(len(PT_bytes) % AES_block_size == 0)
-  CT_bytes = bytearray()
+  CT_bytes = bytearray(len(PT_bytes)) if out is None else out
+  xored = bytearray(AES_block_size)
   CT_block = IV
-  for i in range(len(PT_bytes) // AES_block_size):
-    CT_block = lib_ECB_encrypt(fixed_xor(CT_block, get_block(PT_bytes, i)), key_bytes)
-    CT_bytes += CT_block
-  return bytes(CT_bytes)
+  for PT_block, CT_block_out in zip(iter_blocks(PT_bytes), iter_blocks(CT_bytes)):
+    fixed_xor(CT_block, PT_block, xored)
+    CT_block = lib_ECB_encrypt(xored, key_bytes, CT_block_out)
+  return bytes(CT_bytes) if out is None else out
+
+# CBC_encrypt of many independent messages under one key, each with its own IV
+# Messages are ordered longest first, so the ones that still have a block i are a prefix:
+# round i XORs their chaining blocks with their block i and encrypts them all in one ECB call
+# Number of ECB calls is the length of the longest message in blocks, rather than the total number of blocks
+def CBC_encrypt_many(PT_list, key_bytes, IVs):
+  assert(len(PT_list) == len(IVs))
+  padded = [pkcs7(PT_bytes) for PT_bytes in PT_list]
+  order = sorted(range(len(padded)), key = lambda m: len(padded[m]), reverse = True)
+  num_blocks = [len(padded[m]) // AES_block_size for m in order]
+
+  chain = b"".join(IVs[m] for m in order)
+  rounds = []
+  for i in range(num_blocks[0] if len(order) != 0 else 0):
+    active = sum(1 for b in num_blocks if b > i)
+    PT_round = b"".join(get_block(padded[m], i) for m in order[:active])
+    chain = lib_ECB_encrypt(fixed_xor(chain[:active * AES_block_size], PT_round), key_bytes)
+    rounds.append(chain)
+
+  CT_list = [None] * len(padded)
+  for k, m in enumerate(order):
+    CT_list[m] = b"".join(get_block(rounds[i], k) for i in range(num_blocks[k]))
+  return CT_list
+
+# Keystream bytes [offset, offset + length) of CTR with nonce || 64-bit little endian block counter
+# Only the counter blocks overlapping the range are built, all in one buffer, and encrypted in one ECB call
+def CTR_keystream(key_bytes, nonce_bytes, length, offset = 0):
+  if length == 0:
+    return b""
+  first = offset // AES_block_size
+  last = (offset + length - 1) // AES_block_size
+  nonce_bytes = bytes(nonce_bytes)
+  if np is not None:
+    # Build every counter block in one array: nonce in the first 8 bytes, counter in the last 8
+    counter_blocks = np.empty((last - first + 1, 2), dtype = "<u8")
+    counter_blocks[:, 0] = np.frombuffer(nonce_bytes, dtype = "<u8")[0]
+    counter_blocks[:, 1] = np.arange(first, last + 1, dtype = "<u8")
+    counter_blocks = counter_blocks.tobytes()
+  else:
+    counter_blocks = b"".join([nonce_bytes + ctr.to_bytes(8, "little") for ctr in range(first, last + 1)])
+  keystream = lib_ECB_encrypt(counter_blocks, key_bytes)
+  start = offset % AES_block_size
+  if start == 0 and length == len(keystream):
+    return keystream
+  return keystream[start : start + length]
+
+# With out, the result is XORed straight into out
+def CTR_encrypt(PT_bytes, key_bytes, nonce_bytes, offset = 0, out = None):
+  keystream = CTR_keystream(key_bytes, nonce_bytes, len(PT_bytes), offset)
+  if out is not None:
+    fixed_xor(PT_bytes, keystream, as_view(out)[:len(PT_bytes)])
+    return out
+  return fixed_xor(PT_bytes, keystream)
 
-def CTR_encrypt(PT_bytes, key_bytes, nonce_bytes):
-  ctr = 0
-  keystream = bytearray()
-  while len(keystream) < len(PT_bytes):
-    msg = nonce_bytes + ctr.to_bytes(8, "little")
-    keystream += lib_ECB_encrypt(msg, key_bytes)
-    ctr += 1
-  CT_bytes = fixed_xor(PT_bytes, keystream[:len(PT_bytes)])
-  return bytes(CT_bytes)
+def CTR_decrypt(CT_bytes, key_bytes, nonce, offset = 0, out = None):
+  return CTR_encrypt(CT_bytes, key_bytes, nonce, offset, out)
 
-def CTR_decrypt(CT_bytes, key_bytes, nonce):
-  return CTR_encrypt(CT_bytes, key_bytes, nonce)
+'''
+Given bytes x (or any buffer), returns [positions of block b, ...] for every block value b that occurs at least twice
+Each list of positions is in increasing order
+One pass: with NumPy (when available, for at least numpy_repeat_threshold blocks) the blocks are sorted as
+pairs of 64-bit words so that equal blocks are adjacent, otherwise a dict maps block content to positions
+'''
+def repeated_block_positions(x, block_size = AES_block_size):
+  assert(len(x) % block_size == 0)
+  num_blocks = len(x) // block_size
+  if np is not None and block_size == AES_block_size and num_blocks >= numpy_repeat_threshold:
+    order, same = _sort_blocks(x, num_blocks)
+    return [order[start:end].tolist() for start, end in _runs(same)]
+  positions = dict()
+  for i, block in enumerate(iter_blocks(x, block_size)):
+    positions.setdefault(block.tobytes(), []).append(i)
+  return [p for p in positions.values() if len(p) > 1]
+
+'''
+Returns (order, same): order sorts the blocks of x (equal blocks in increasing position, lexsort is stable),
+same[k] is whether sorted blocks k and k+1 are equal
+'''
+def _sort_blocks(x, num_blocks):
+  words = np.frombuffer(as_view(x), dtype = "<u8", count = 2 * num_blocks).reshape(num_blocks, 2)
+  order = np.lexsort((words[:, 1], words[:, 0]))
+  sorted_words = words[order]
+  same = (sorted_words[1:] == sorted_words[:-1]).all(axis = 1)
+  return order, same
+
+'''
+Yields (start, end) of every run of at least two equal sorted blocks, given same from _sort_blocks
+'''
+def _runs(same):
+  edges = np.diff(np.concatenate(([0], same.astype(np.int8), [0])))
+  starts = np.flatnonzero(edges == 1)
+  ends = np.flatnonzero(edges == -1) + 1
+  return zip(starts.tolist(), ends.tolist())
 
 '''
-Given bytes x, return array of (i,j) where x[i] = x[j]
+Given bytes x, return array of (i,j) where x[i] = x[j], sorted
+If counts_only = True, return {block: number of occurrences} for the repeated blocks instead, without building pairs
 '''
-def find_repeated_chunks(x):
+def find_repeated_chunks(x, counts_only = False):
   assert(len(x) % 16 == 0)
-  num_bytes = len(x) // 16
+  if counts_only:
+    num_blocks = len(x) // 16
+    if np is not None and num_blocks >= numpy_repeat_threshold:
+      order, same = _sort_blocks(x, num_blocks)
+      return {bytes(get_block(x, int(order[start]))): end - start for start, end in _runs(same)}
+    counts = Counter(block.tobytes() for block in iter_blocks(x))
+    return {block: count for block, count in counts.items() if count > 1}
   repeated = []
-  for i in range(num_bytes):
-    for j in range(i+1, num_bytes):
-      xi = get_block(x, i)
-      xj = get_block(x, j)
-      if xi == xj:
-        repeated.append((i,j))
-  return repeated
+  for positions in repeated_block_positions(x):
+    for a in range(len(positions)):
+      for b in range(a + 1, len(positions)):
+        repeated.append((positions[a], positions[b]))
+  return sorted(repeated)
 
 '''
 Detect ECB mode by checking if there are repeated chunks
+Stops at the first repeat: block by block through a set, or with NumPy (for long inputs) on doubling prefixes
 Note: False positives likely for very long messages
       False negatives likely for short messages
 '''
 def detect_ECB(x):
-  return len(find_repeated_chunks(x)) != 0
+  num_blocks = len(x) // 16
+  if np is not None and num_blocks >= numpy_repeat_threshold:
+    prefix = numpy_repeat_threshold
+    while True:
+      prefix = min(prefix, num_blocks)
+      if _sort_blocks(x, prefix)[1].any():
+        return True
+      if prefix == num_blocks:
+        return False
+      prefix *= 2
+  seen = set()
+  for block in iter_blocks(x):
+    block = block.tobytes()
+    if block in seen:
+      return True
+    seen.add(block)
+  return False
 
 '''
-Returns n random bytes
+Returns n random bytes, from one getrandbits call rather than one call per byte
+rng: a random.Random instance (e.g. seeded per worker, see monte_carlo), default the module-level generator
 '''
-def random_bytes(n):
-  output = bytearray()
-  for i in range(n):
-    output.append(random.randint(0, 255))
-  return bytes(output)
+def random_bytes(n, rng = None):
+  return (rng or random).getrandbits(8 * n).to_bytes(n, "little")
 
 '''
 Returns random bytes of length [lb, ub] 
 '''
-def random_bytes_range(lb, ub):
-  return random_bytes(random.randint(lb, ub+1))
+def random_bytes_range(lb, ub, rng = None):
+  return random_bytes((rng or random).randint(lb, ub+1), rng)
 
 '''
 MersenneTwister implementation (See challenge21)
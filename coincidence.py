@@ -0,0 +1,94 @@
+'''
+Key length detection for repeating-key XOR by counting coincidences (See challenge6)
+
+Under a key of length k, CT[i] == CT[i+s] happens about as often as in English when k divides s,
+and about 1/256 of the time otherwise. So the key length is the period with the highest coincidence rate
+
+The number of equal bytes at every shift s is an autocorrelation:
+  C[s] = sum over byte values v of sum over i of [CT[i] == v][CT[i+s] == v]
+so one zero-padded FFT per distinct byte value (at most 256) gives C[s] for every shift at once, in O(n log n)
+
+To run: python3 coincidence.py <Optional: bestKL. Default = 1>
+'''
+
+import sys
+import numpy as np
+from challenge_util import *
+from challenge6 import read_challenge, test_keylengths
+
+'''
+Returns smallest size >= n of the form 2^k or 3 * 2^k (both fast FFT sizes)
+'''
+def fft_size(n):
+  size = 1 << max(n - 1, 1).bit_length()
+  if size // 4 * 3 >= n:
+    return size // 4 * 3
+  return size
+
+'''
+Returns array C of length max_shift+1 where C[s] = number of i with x[i] == x[i+s]
+max_shift defaults to len(x) - 1
+'''
+def coincidence_counts(x, max_shift = None):
+  x = np.frombuffer(x, dtype = np.uint8)
+  n = len(x)
+  if max_shift is None:
+    max_shift = n - 1
+  # Zero pad to at least n + max_shift so that circular correlation does not wrap around
+  size = fft_size(n + max_shift)
+  power = np.zeros(size // 2 + 1)
+  for v in np.unique(x):
+    spectrum = np.fft.rfft((x == v).astype(np.float64), size)
+    power += spectrum.real ** 2 + spectrum.imag ** 2
+  return np.rint(np.fft.irfft(power, size)[:max_shift + 1]).astype(np.int64)
+
+'''
+Returns array R with R[s] = C[s] / (n - s), the coincidence rate at shift s, for s in [0, max_shift]
+'''
+def coincidence_rates(x, max_shift = None):
+  counts = coincidence_counts(x, max_shift)
+  return counts / (len(x) - np.arange(len(counts)))
+
+'''
+Given the rates and the period k with the highest rate, return the smallest divisor of k that is about as good
+Multiples of the key length have the same expected rate, so the top period may be one of them
+'''
+def resolve_period(rates, k, lb):
+  baseline = np.median(rates[lb:])
+  for d in range(lb, k + 1):
+    if k % d == 0 and rates[d] - baseline >= 0.8 * (rates[k] - baseline):
+      return d
+  return k
+
+'''
+Rank key sizes k in [lb, lb+1, ..., ub] in descending coincidence rate, with the resolved period first
+Returns [(-rate, k), ...] so that it is a drop-in for challenge6.rank_keylengths in test_keylengths
+ub defaults to len(CT_bytes) // 2
+'''
+def rank_keylengths(CT_bytes, lb, ub = None):
+  if ub is None:
+    ub = len(CT_bytes) // 2
+  rates = coincidence_rates(CT_bytes, ub)
+  ranking = sorted((-rates[k].item(), k) for k in range(lb, ub + 1))
+  period = resolve_period(rates, ranking[0][1], lb)
+  return sorted(ranking, key = lambda x: x[1] != period)
+
+def main(argv):
+  if len(argv) >= 2:
+    bestKL = int(argv[1])
+  else:
+    bestKL = 1 # Just output top guess
+
+  CT_bytes = read_challenge("challenge6.txt", "base64")
+  keylength_ranking = rank_keylengths(CT_bytes, 2)
+  print("Top key lengths by coincidence rate: {0}".format([(k, round(-rate, 4)) for rate, k in keylength_ranking[:5]]))
+  guesses = test_keylengths(CT_bytes, keylength_ranking, ascii_letterspaces, bestKL)
+
+  for keylength, best_key, PT_bytes in guesses:
+    print("Best key of length {0}: {1}".format(keylength, best_key))
+    print("Decoded:\n{0}".format(PT_bytes))
+    print()
+
+if __name__ == "__main__":
+  print("Usage: python3 coincidence.py <Optional: bestKL. Default = 1>")
+  main(sys.argv)
@@ -0,0 +1,254 @@
+'''
+Corpus-wide ciphertext block index to detect ECB key reuse across messages (See challenge8)
+
+challenge8 looks for a 16-byte block repeated within one message. Across a corpus, the same block in
+different messages is the stronger signal: ECB under a shared key (and the same plaintext block)
+The index is an sqlite3 file mapping block hash -> (message id, block index), built in one streaming
+pass over the corpus (one message per line, as read by iter_challenge), inserted in fixed-size batches
+With bloom = True, a first pass through two Bloom filters (seen once, seen twice) keeps only blocks
+that occur more than once. Most blocks of a corpus occur once, so the index stays small
+Messages sharing any block are then grouped into clusters with union-find, stored in the index too
+
+To run:
+  python3 ecb_index.py build <index file> <hex|base64> <Optional: bloom> <corpus file> [corpus files...]
+  python3 ecb_index.py clusters <index file>
+  python3 ecb_index.py block <index file> <hex block>
+  python3 ecb_index.py message <index file> <message id>
+'''
+
+import hashlib
+import math
+import os
+import sqlite3
+import sys
+from challenge_util import *
+
+batch_rows = 1 << 16 # Rows inserted per executemany
+bloom_error = 0.01 # False positive rate of each Bloom filter
+
+'''
+Signed 64-bit hash of a block (sqlite3 INTEGER)
+'''
+def block_hash(block):
+  return int.from_bytes(hashlib.blake2b(block, digest_size = 8).digest(), "little", signed = True)
+
+'''
+Bloom filter over 64-bit hashes, with num_hashes bit positions derived from each hash by double hashing
+'''
+class BloomFilter:
+  def __init__(self, expected, error = bloom_error):
+    expected = max(expected, 1)
+    self.num_bits = max(int(-expected * math.log(error) / math.log(2) ** 2), 8)
+    self.num_hashes = max(int(round(self.num_bits / expected * math.log(2))), 1)
+    self.bits = bytearray((self.num_bits + 7) // 8)
+
+  def positions(self, h):
+    h &= 0xffffffffffffffff
+    h1, h2 = h & 0xffffffff, (h >> 32) | 1
+    return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+  # Adds h, returns whether it was (probably) present already
+  def add(self, h):
+    present = True
+    for p in self.positions(h):
+      if not self.bits[p >> 3] & (1 << (p & 7)):
+        present = False
+        self.bits[p >> 3] |= 1 << (p & 7)
+    return present
+
+  def __contains__(self, h):
+    return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self.positions(h))
+
+'''
+Yields (filename, line number, ciphertext) for every message of the corpus, one line at a time
+'''
+def iter_messages(filenames, encoding):
+  for filename in filenames:
+    for line_no, CT_bytes in enumerate(iter_challenge(filename, encoding)):
+      if len(CT_bytes) != 0:
+        yield filename, line_no, CT_bytes
+
+'''
+Yields (hash, block index) of the whole blocks of CT_bytes
+'''
+def iter_hashes(CT_bytes):
+  for idx in range(len(CT_bytes) // AES_block_size):
+    yield block_hash(get_block(CT_bytes, idx)), idx
+
+'''
+First pass: returns a Bloom filter of the hashes seen at least twice in the corpus
+'''
+def repeated_filter(filenames, encoding):
+  expected = sum(os.path.getsize(filename) for filename in filenames) // AES_block_size
+  seen, repeated = BloomFilter(expected), BloomFilter(expected)
+  for filename, line_no, CT_bytes in iter_messages(filenames, encoding):
+    for h, idx in iter_hashes(CT_bytes):
+      if seen.add(h):
+        repeated.add(h)
+  return repeated
+
+'''
+Union-find over message ids, with path halving and union by size
+'''
+class UnionFind:
+  def __init__(self):
+    self.parent = dict()
+    self.size = dict()
+
+  def find(self, x):
+    self.parent.setdefault(x, x)
+    self.size.setdefault(x, 1)
+    while self.parent[x] != x:
+      self.parent[x] = self.parent[self.parent[x]]
+      x = self.parent[x]
+    return x
+
+  def union(self, x, y):
+    x, y = self.find(x), self.find(y)
+    if x == y:
+      return
+    if self.size[x] < self.size[y]:
+      x, y = y, x
+    self.parent[y] = x
+    self.size[x] += self.size[y]
+
+def create_tables(conn):
+  conn.executescript("""
+    DROP TABLE IF EXISTS messages;
+    DROP TABLE IF EXISTS blocks;
+    DROP TABLE IF EXISTS clusters;
+    CREATE TABLE messages (id INTEGER PRIMARY KEY, file TEXT, line INTEGER, num_blocks INTEGER);
+    CREATE TABLE blocks (hash INTEGER, msg INTEGER, idx INTEGER);
+    CREATE TABLE clusters (msg INTEGER PRIMARY KEY, cluster INTEGER);
+  """)
+
+'''
+Clusters messages that share a block: union-find over every hash found in more than one message
+Only messages in a cluster of at least two are stored, with the smallest message id as the cluster id
+'''
+def build_clusters(conn):
+  uf = UnionFind()
+  rows = conn.execute("SELECT hash, msg FROM blocks WHERE hash IN "
+                      "(SELECT hash FROM blocks GROUP BY hash HAVING COUNT(DISTINCT msg) > 1) ORDER BY hash")
+  last_hash, first_msg = None, None
+  for h, msg in rows:
+    if h != last_hash:
+      last_hash, first_msg = h, msg
+    else:
+      uf.union(first_msg, msg)
+  members = dict()
+  for msg in uf.parent:
+    members.setdefault(uf.find(msg), []).append(msg)
+  conn.executemany("INSERT INTO clusters VALUES (?, ?)",
+                   ((msg, min(group)) for group in members.values() for msg in group))
+  conn.execute("CREATE INDEX clusters_by_cluster ON clusters (cluster)")
+
+'''
+Builds the index of the corpus (files of one encoded message per line) in index_filename, replacing any old index
+Returns the open connection
+'''
+def build_index(index_filename, filenames, encoding, bloom = False):
+  if os.path.exists(index_filename):
+    os.remove(index_filename) # Start from an empty file: sqlite3 does not shrink files on DROP TABLE
+  conn = sqlite3.connect(index_filename)
+  conn.execute("PRAGMA journal_mode = OFF")
+  conn.execute("PRAGMA synchronous = OFF")
+  create_tables(conn)
+  keep = repeated_filter(filenames, encoding) if bloom else None
+
+  rows = []
+  for msg, (filename, line_no, CT_bytes) in enumerate(iter_messages(filenames, encoding)):
+    conn.execute("INSERT INTO messages VALUES (?, ?, ?, ?)", (msg, filename, line_no, len(CT_bytes) // AES_block_size))
+    for h, idx in iter_hashes(CT_bytes):
+      if keep is None or h in keep:
+        rows.append((h, msg, idx))
+    if len(rows) >= batch_rows:
+      conn.executemany("INSERT INTO blocks VALUES (?, ?, ?)", rows)
+      rows = []
+  conn.executemany("INSERT INTO blocks VALUES (?, ?, ?)", rows)
+
+  # Indexes after the bulk load, so inserts do not maintain them row by row
+  conn.execute("CREATE INDEX blocks_by_hash ON blocks (hash)")
+  conn.execute("CREATE INDEX blocks_by_msg ON blocks (msg)")
+  build_clusters(conn)
+  conn.commit()
+  return conn
+
+def open_index(index_filename):
+  return sqlite3.connect(index_filename)
+
+#
+# Queries (each is one or two indexed lookups)
+#
+'''
+Returns [(message id, block index), ...] where block occurs
+'''
+def find_block(conn, block):
+  return conn.execute("SELECT msg, idx FROM blocks WHERE hash = ? ORDER BY msg, idx", (block_hash(block),)).fetchall()
+
+'''
+Returns (file, line number, number of blocks) of message msg
+'''
+def message_info(conn, msg):
+  return conn.execute("SELECT file, line, num_blocks FROM messages WHERE id = ?", (msg,)).fetchone()
+
+'''
+Returns sorted message ids in the same cluster as msg ([msg] if it shares no block)
+'''
+def cluster_of(conn, msg):
+  row = conn.execute("SELECT cluster FROM clusters WHERE msg = ?", (msg,)).fetchone()
+  if row is None:
+    return [msg]
+  return [m for (m,) in conn.execute("SELECT msg FROM clusters WHERE cluster = ? ORDER BY msg", row)]
+
+'''
+Returns [(cluster id, number of messages), ...] from the largest cluster down
+'''
+def list_clusters(conn):
+  return conn.execute("SELECT cluster, COUNT(*) AS size FROM clusters GROUP BY cluster ORDER BY size DESC, cluster").fetchall()
+
+'''
+Returns [(block index, [(other message id, block index), ...]), ...] for the blocks of msg found elsewhere
+(in other messages, or at another index of msg itself as in challenge8)
+'''
+def shared_blocks(conn, msg):
+  rows = conn.execute("SELECT a.idx, b.msg, b.idx FROM blocks a JOIN blocks b ON a.hash = b.hash "
+                      "WHERE a.msg = ? AND NOT (b.msg = a.msg AND b.idx = a.idx) ORDER BY a.idx, b.msg, b.idx", (msg,))
+  shared = []
+  for idx, other, other_idx in rows:
+    if len(shared) == 0 or shared[-1][0] != idx:
+      shared.append((idx, []))
+    shared[-1][1].append((other, other_idx))
+  return shared
+
+def main(argv):
+  command, index_filename = argv[1], argv[2]
+  if command == "build":
+    bloom = argv[4] == "bloom"
+    conn = build_index(index_filename, argv[5 if bloom else 4:], argv[3], bloom)
+  else:
+    conn = open_index(index_filename)
+
+  if command in ["build", "clusters"]:
+    for cluster, size in list_clusters(conn):
+      print("Cluster {0}: {1} messages {2}".format(cluster, size, cluster_of(conn, cluster)))
+  elif command == "block":
+    print(find_block(conn, codecs.decode(argv[3], "hex")))
+  elif command == "message":
+    msg = int(argv[3])
+    print("Message {0}: {1}".format(msg, message_info(conn, msg)))
+    print("Cluster: {0}".format(cluster_of(conn, msg)))
+    for idx, others in shared_blocks(conn, msg):
+      print("Block {0} also at {1}".format(idx, others))
+  print()
+  conn.close()
+
+if __name__ == "__main__":
+  if len(sys.argv) >= 4 and sys.argv[1] in ["build", "clusters", "block", "message"] or len(sys.argv) == 3 and sys.argv[1] == "clusters":
+    main(sys.argv)
+  else:
+    print("Usage:")
+    print("  python3 ecb_index.py build <index file> <hex|base64> <Optional: bloom> <corpus file> [corpus files...]")
+    print("  python3 ecb_index.py clusters <index file>")
+    print("  python3 ecb_index.py block <index file> <hex block>")
+    print("  python3 ecb_index.py message <index file> <message id>")
@@ -0,0 +1,91 @@
+'''
+Bulk popcount and Hamming distance kernels (See challenge6)
+
+hamming        : distance between two buffers
+hamming_matrix : pairwise distance matrix over many equal-length blocks
+hamming_shift  : distance between a buffer and itself shifted by some bytes
+hamming_shifts : hamming_shift for every shift up to some bound at once
+
+Buffers are XORed as big integers and popcounted with int.bit_count (or a byte lookup table on
+Pythons without it). With NumPy, use_numpy = True unpacks bits with unpackbits instead
+'''
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+#
+# Constants
+#
+popcount_table = bytes([bin(i).count("1") for i in range(256)])
+
+#
+# Functions
+#
+'''
+Returns number of 1 bits in non-negative integer x
+'''
+if hasattr(int, "bit_count"):
+  def popcount(x):
+    return x.bit_count()
+else:
+  def popcount(x):
+    return sum(x.to_bytes((x.bit_length() + 7) // 8, "little").translate(popcount_table))
+
+'''
+Count number of 1's in (x XOR y)
+x and y are same length buffers
+'''
+def hamming(x, y, use_numpy = False):
+  assert(len(x) == len(y))
+  if use_numpy:
+    return int(np.unpackbits(np.bitwise_xor(np.frombuffer(x, dtype = np.uint8), np.frombuffer(y, dtype = np.uint8))).sum())
+  return popcount(int.from_bytes(x, "little") ^ int.from_bytes(y, "little"))
+
+'''
+Given m same length blocks, returns m x m matrix D where D[i][j] = hamming(blocks[i], blocks[j])
+Returns a list of lists, or a NumPy array if use_numpy = True
+'''
+def hamming_matrix(blocks, use_numpy = False):
+  if use_numpy:
+    bits = np.unpackbits(np.frombuffer(b"".join(bytes(b) for b in blocks), dtype = np.uint8).reshape(len(blocks), -1), axis = 1).astype(np.int64)
+    # |a XOR b| = |a| + |b| - 2 |a AND b|
+    ones = bits.sum(axis = 1)
+    return ones[:, None] + ones[None, :] - 2 * (bits @ bits.T)
+  assert(len(set(len(b) for b in blocks)) <= 1)
+  values = [int.from_bytes(b, "little") for b in blocks]
+  return [[popcount(vi ^ vj) for vj in values] for vi in values]
+
+'''
+Returns hamming(x[:len(x)-shift], x[shift:]), i.e. distance between x and itself shifted by shift bytes
+'''
+def hamming_shift(x, shift, use_numpy = False):
+  assert(0 < shift <= len(x))
+  view = memoryview(x).cast("B")
+  return hamming(view[:len(x) - shift], view[shift:], use_numpy)
+
+'''
+Returns D of length max_shift+1 where D[s] = hamming_shift(x, s) for s in [1, max_shift] (and D[0] = 0)
+|a XOR b| = |a| + |b| - 2 |a AND b| bit by bit, so summed over i:
+  D[s] = (1 bits in x[:n-s]) + (1 bits in x[s:]) - 2 * sum over bit planes p of sum over i of p[i] p[i+s]
+The last term is the autocorrelation of each of the 8 bit planes, so with NumPy one zero-padded FFT per plane
+gives every shift at once in O(n log n). Without NumPy, one hamming_shift per shift
+Returns a list, or a NumPy array if use_numpy = True (the default when NumPy is available)
+'''
+def hamming_shifts(x, max_shift, use_numpy = np is not None):
+  assert(0 <= max_shift < len(x))
+  if not use_numpy:
+    return [0] + [hamming_shift(x, s) for s in range(1, max_shift + 1)]
+  x = np.frombuffer(x, dtype = np.uint8)
+  n = len(x)
+  # Zero pad to at least n + max_shift so that circular correlation does not wrap around
+  size = 1 << (n + max_shift - 1).bit_length()
+  power = np.zeros(size // 2 + 1)
+  for b in range(8):
+    spectrum = np.fft.rfft(((x >> b) & 1).astype(np.float64), size)
+    power += spectrum.real ** 2 + spectrum.imag ** 2
+  both = np.rint(np.fft.irfft(power, size)[:max_shift + 1]).astype(np.int64)
+  ones = np.concatenate([[0], np.cumsum(np.frombuffer(popcount_table, dtype = np.uint8)[x], dtype = np.int64)])
+  shifts = np.arange(max_shift + 1)
+  return ones[n - shifts] + (ones[n] - ones[shifts]) - 2 * both
@@ -0,0 +1,60 @@
+'''
+Joint key enumeration in likelihood order for multi-byte XOR keys (See challenge6)
+
+Keeping only the best byte per key column makes the whole key wrong as soon as one column is ambiguous
+Instead, keep the top_k candidates per column with their scores and enumerate full keys best-first:
+the joint score of a key is the sum of its column scores, and a priority queue yields keys in
+decreasing joint score, lazily, until a caller-supplied validator accepts the decryption
+'''
+
+import heapq
+from challenge_util import *
+
+printable = set([9, 10, 13] + list(range(32, 127)))
+
+'''
+Returns [[(score, byte), ...] for each column], each list from best to worst with at most top_k entries
+'''
+def column_candidates(CT_bytes, keylength, score_set, top_k):
+  return [rank_xor_keys(CT_bytes[i::keylength], score_set)[:top_k] for i in range(keylength)]
+
+'''
+Yields (joint score, key) over every combination of column candidates, in decreasing joint score
+Each key index tuple t has exactly one parent: t with its last non-zero coordinate decremented.
+So children of t only increment coordinates from its last non-zero one onwards, and nothing is pushed twice
+'''
+def enumerate_keys(candidates):
+  if len(candidates) == 0 or any(len(c) == 0 for c in candidates):
+    return
+  start = tuple([0] * len(candidates))
+  heap = [(-sum(c[0][0] for c in candidates), start)]
+  while len(heap) != 0:
+    neg_score, idx = heapq.heappop(heap)
+    yield -neg_score, bytes(candidates[i][idx[i]][1] for i in range(len(idx)))
+
+    last = max([i for i in range(len(idx)) if idx[i] != 0], default = 0)
+    for i in range(last, len(idx)):
+      if idx[i] + 1 < len(candidates[i]):
+        child = idx[:i] + (idx[i] + 1,) + idx[i+1:]
+        child_score = -neg_score - candidates[i][idx[i]][0] + candidates[i][idx[i] + 1][0]
+        heapq.heappush(heap, (-child_score, child))
+
+'''
+Returns (key, PT_bytes) for the most likely key of length keylength whose decryption validator accepts
+Tries at most max_keys keys (None for no limit) out of top_k candidates per column; returns None if none is accepted
+'''
+def search_key(CT_bytes, keylength, score_set, validator, top_k = 4, max_keys = None):
+  candidates = column_candidates(CT_bytes, keylength, score_set, top_k)
+  for tries, (score, key) in enumerate(enumerate_keys(candidates)):
+    if max_keys is not None and tries >= max_keys:
+      break
+    PT_bytes = repeated_xor(key, CT_bytes)
+    if validator(PT_bytes):
+      return key, PT_bytes
+  return None
+
+'''
+Example validator: every byte is printable ASCII (or tab/newline/carriage return)
+'''
+def is_printable(PT_bytes):
+  return all(b in printable for b in set(PT_bytes))
@@ -0,0 +1,98 @@
+'''
+Parallel Monte Carlo harness for randomized oracles (See challenge11)
+
+A trial function takes a random.Random instance, draws all of its randomness from it and returns (actual, predicted)
+Trials are split into chunks that run across a process pool. Chunk i is seeded from (seed, i), so the results
+depend only on the seed and the number of trials, whatever the number of workers, and chunks never share a stream
+Outcomes are aggregated into a confusion matrix, with Wilson score intervals on the accuracy of each class
+Nothing is printed per trial
+
+To run: python3 monte_carlo.py <module:trial function> <number of trials> <Optional: workers. Default = all cores> <Optional: seed. Default = 0>
+e.g. python3 monte_carlo.py challenge11:trial 1000000
+'''
+
+import importlib
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+chunk_trials = 1 << 12 # Trials per task sent to a worker
+
+'''
+Returns the trial function named "module:function"
+'''
+def load_trial(name):
+  module, function = name.split(":")
+  return getattr(importlib.import_module(module), function)
+
+'''
+Worker: runs num_trials trials of the named trial function with its own seeded generator
+Returns Counter of (actual, predicted)
+'''
+def run_chunk(trial_name, seed, chunk_idx, num_trials):
+  trial = load_trial(trial_name)
+  rng = random.Random("{0}:{1}".format(seed, chunk_idx))
+  return Counter(tuple(trial(rng)) for i in range(num_trials))
+
+'''
+Runs num_trials trials of trial_name ("module:function") on workers processes (None: every core)
+Returns (confusion Counter of (actual, predicted), elapsed seconds)
+'''
+def run(trial_name, num_trials, workers = None, seed = 0):
+  start = time.perf_counter()
+  confusion = Counter()
+  chunks = [(i, min(chunk_trials, num_trials - first)) for i, first in enumerate(range(0, num_trials, chunk_trials))]
+  with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+    futures = [pool.submit(run_chunk, trial_name, seed, i, n) for i, n in chunks]
+    for future in futures:
+      confusion.update(future.result())
+  return confusion, time.perf_counter() - start
+
+'''
+Wilson score interval for successes out of trials (z = 1.96 for 95%)
+'''
+def wilson_interval(successes, trials, z = 1.96):
+  if trials == 0:
+    return 0.0, 1.0
+  p = successes / trials
+  denominator = 1 + z * z / trials
+  center = (p + z * z / (2 * trials)) / denominator
+  half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+  return max(center - half, 0.0), min(center + half, 1.0)
+
+'''
+Prints the confusion matrix (rows: actual, columns: predicted), accuracy per actual class and overall, and trials/sec
+'''
+def report(confusion, elapsed):
+  labels = sorted(set(a for a, p in confusion) | set(p for a, p in confusion), key = str)
+  total = sum(confusion.values())
+  print("{0:>14} | ".format("actual \\ guess") + " | ".join("{0:>10}".format(str(l)) for l in labels))
+  for actual in labels:
+    print("{0:>14} | ".format(str(actual)) + " | ".join("{0:>10}".format(confusion[(actual, p)]) for p in labels))
+  print()
+  for actual in labels:
+    n = sum(confusion[(actual, p)] for p in labels)
+    if n != 0:
+      lo, hi = wilson_interval(confusion[(actual, actual)], n)
+      print("Accuracy on {0}: {1:.6f} (95% CI [{2:.6f}, {3:.6f}]) over {4} trials".format(actual, confusion[(actual, actual)] / n, lo, hi, n))
+  correct = sum(confusion[(l, l)] for l in labels)
+  lo, hi = wilson_interval(correct, total)
+  print("Overall accuracy: {0:.6f} (95% CI [{1:.6f}, {2:.6f}]) over {3} trials".format(correct / max(total, 1), lo, hi, total))
+  print("{0:.0f} trials/sec ({1:.3f}s)".format(total / elapsed, elapsed))
+  print()
+
+def main(argv):
+  workers = int(argv[3]) if len(argv) >= 4 else None
+  seed = int(argv[4]) if len(argv) >= 5 else 0
+  confusion, elapsed = run(argv[1], int(argv[2]), workers, seed)
+  report(confusion, elapsed)
+
+if __name__ == "__main__":
+  if len(sys.argv) >= 3 and ":" in sys.argv[1] and sys.argv[2].isdigit():
+    main(sys.argv)
+  else:
+    print("Usage: python3 monte_carlo.py <module:trial function> <number of trials> <Optional: workers. Default = all cores> <Optional: seed. Default = 0>")
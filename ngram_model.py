@@ -0,0 +1,142 @@
+'''
+Frequency-weighted English scoring model compiled from norvig_freq.txt
+Source: http://norvig.com/mayzner.html
+
+norvig_freq.txt lists the 1-gram to 9-gram columns in rank order (most frequent first) without counts,
+so probabilities are recovered from ranks with Zipf's law: the r-th most frequent n-gram has weight 1/r
+
+Everything is compiled into flat tables once, at load time:
+  byte_logp[b]            : log-probability of byte b in English text
+  ngram_table[n][idx]     : log-odds of a letter n-gram against an unlisted one (0 if unlisted)
+                            where idx = sum(byte_class[b_i] * num_classes ** (n-1-i))
+Scoring a buffer is then only array lookups, no set or dict membership tests
+'''
+
+import math
+from itertools import accumulate, repeat
+from operator import add, mul
+
+#
+# Constants
+#
+num_classes = 28 # a-z (case folded), space, everything else
+space_class = 26
+other_class = 27
+
+# Share of English text taken by each kind of byte
+letter_share = 0.78
+upper_share = 0.04 # Of letters
+space_share = 0.15
+punctuation_share = 0.05
+printable_share = 0.02
+unprintable_prob = 1e-6 # Per byte
+
+punctuation = b".,'\"!?;:-\n0123456789"
+separator = 0 # Byte of other_class used to keep buffers apart in score_many
+
+'''
+Returns [[ngram, ...] for n = 1, 2, ...], each list in rank order
+'''
+def read_norvig_freq(filename):
+  columns = []
+  with open(filename, 'r') as fin:
+    for line in fin:
+      for x in line.split():
+        n = len(x)
+        while len(columns) < n:
+          columns.append([])
+        columns[n-1].append(x.lower())
+  return columns
+
+class NgramModel:
+  def __init__(self, filename = "norvig_freq.txt", max_n = 3, ngram_weight = 1.0):
+    self.columns = read_norvig_freq(filename)
+    self.max_n = min(max_n, len(self.columns))
+    self.ngram_weight = ngram_weight
+
+    # byte -> class index, also as a bytes.translate table
+    self.byte_class = [other_class] * 256
+    for i in range(26):
+      self.byte_class[ord('a') + i] = i
+      self.byte_class[ord('A') + i] = i
+    self.byte_class[ord(' ')] = space_class
+    self.class_table = bytes(self.byte_class)
+
+    self.byte_logp = self.compile_byte_logp()
+    self.ngram_table = dict()
+    for n in range(2, self.max_n + 1):
+      self.ngram_table[n] = self.compile_ngram_table(n)
+
+  # Zipf weights 1/r for the ranked column of n-grams, normalized to sum to 1
+  def zipf(self, n):
+    column = self.columns[n-1]
+    total = sum(1 / (r+1) for r in range(len(column)))
+    return [(ngram, 1 / (r+1) / total) for r, ngram in enumerate(column)]
+
+  def compile_byte_logp(self):
+    prob = [unprintable_prob] * 256
+    for letter, p in self.zipf(1):
+      prob[ord(letter)] = letter_share * (1 - upper_share) * p
+      prob[ord(letter.upper())] = letter_share * upper_share * p
+    prob[ord(' ')] = space_share
+    for b in punctuation:
+      prob[b] = punctuation_share / len(punctuation)
+    rest = [b for b in range(32, 127) if self.byte_class[b] == other_class and b not in punctuation]
+    for b in rest:
+      prob[b] = printable_share / len(rest)
+    total = sum(prob)
+    return [math.log(p / total) for p in prob]
+
+  # Log-odds of each listed n-gram against the least frequent listed one
+  def compile_ngram_table(self, n):
+    table = [0.0] * (num_classes ** n)
+    ranked = self.zipf(n)
+    floor = ranked[-1][1] / 2
+    for ngram, p in ranked:
+      idx = 0
+      for ch in ngram:
+        idx = idx * num_classes + self.byte_class[ord(ch)]
+      table[idx] = self.ngram_weight * math.log(p / floor)
+    return table
+
+  # Per-position score contributions: byte log-probability plus every n-gram ending there
+  def contributions(self, buf):
+    logp = self.byte_logp
+    contrib = list(map(logp.__getitem__, buf))
+    classes = bytes(buf).translate(self.class_table)
+    for n, table in self.ngram_table.items():
+      count = len(classes) - n + 1
+      if count <= 0:
+        continue
+      idx = classes[:count]
+      for k in range(1, n):
+        idx = map(add, map(mul, idx, repeat(num_classes)), classes[k : k + count])
+      contrib[n-1:] = map(add, contrib[n-1:], map(table.__getitem__, idx))
+    return contrib
+
+  # Log-likelihood style score of bytes buf (higher is more English-like)
+  def score(self, buf):
+    return sum(self.contributions(buf))
+
+  # [score(buf) for buf in bufs], computed in one pass over the joined buffers
+  # The separator byte has other_class, so no listed n-gram spans two buffers
+  def score_many(self, bufs):
+    bufs = [bytes(buf) for buf in bufs]
+    joined = bytes([separator]).join(bufs)
+    prefix = [0.0] + list(accumulate(self.contributions(joined)))
+    scores = []
+    start = 0
+    for buf in bufs:
+      end = start + len(buf)
+      scores.append(prefix[end] - prefix[start])
+      start = end + 1
+    return scores
+
+  # {ngram: weight} for every listed n-gram, relative to the least frequent one of its length (See challenge19)
+  def ngram_weights(self):
+    weights = dict()
+    for n in range(1, len(self.columns) + 1):
+      ranked = self.zipf(n)
+      for ngram, p in ranked:
+        weights[ngram] = p / ranked[-1][1]
+    return weights
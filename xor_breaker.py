@@ -0,0 +1,138 @@
+'''
+Memory-mapped repeating-key XOR breaker for files too large to load (See challenge6)
+
+The ciphertext file is memory-mapped and read through reshape views: with key length k,
+data[:rows * k].reshape(rows, k)[:, j] is key column j, as a strided view rather than a copy
+Column histograms are accumulated over fixed-size runs of rows, and the decryption is written
+straight into a memory-mapped output file. Pages already processed are dropped from the mappings,
+so resident memory is a fixed chunk buffer plus O(key length) tables, whatever the file size
+
+To run: python3 xor_breaker.py <ciphertext file> <output file> <Optional: key length. Default = detect>
+'''
+
+import mmap
+import os
+import sys
+import numpy as np
+from challenge_util import *
+from xor_detect import key_score_matrix
+import coincidence
+
+chunk_bytes = 1 << 20 # Bytes of the file processed per step
+sample_bytes = 1 << 18 # Bytes of the file used to detect the key length
+max_keylength = 1 << 10
+
+'''
+Memory-maps filename, returning (mmap, uint8 array over it)
+If size is given, the file is created (or truncated) with that size and mapped for writing
+'''
+def map_file(filename, size = None):
+  if size is None:
+    with open(filename, 'rb') as fin:
+      mm = mmap.mmap(fin.fileno(), 0, access = mmap.ACCESS_READ)
+  else:
+    with open(filename, 'w+b') as fout:
+      fout.truncate(size)
+      mm = mmap.mmap(fout.fileno(), size, access = mmap.ACCESS_WRITE)
+  return mm, np.frombuffer(mm, dtype = np.uint8)
+
+'''
+Drop pages of mm before offset end from this process (they stay in the page cache, dirty pages get written back)
+'''
+def release(mm, end):
+  end -= end % mmap.PAGESIZE
+  if end > 0 and hasattr(mm, "madvise"):
+    mm.madvise(mmap.MADV_DONTNEED, 0, end)
+
+'''
+Yields (start, row view) over data in runs of whole key-length rows, then (start, tail) for the last len(data) % k bytes
+Pages of the given mappings are released once their rows have been processed
+'''
+def row_chunks(data, keylength, mappings = ()):
+  rows = len(data) // keylength
+  step = max(chunk_bytes // keylength, 1)
+  for r in range(0, rows, step):
+    r_end = min(r + step, rows)
+    yield r * keylength, data[r * keylength : r_end * keylength].reshape(-1, keylength)
+    for mm in mappings:
+      release(mm, r_end * keylength)
+  if len(data) % keylength != 0:
+    yield rows * keylength, data[rows * keylength :].reshape(1, -1)
+
+'''
+Returns keylength x 256 array of byte histograms, one row per key column
+'''
+def column_histograms(data, keylength, mappings = ()):
+  histograms = np.zeros(keylength * 256, dtype = np.int64)
+  offsets = np.arange(keylength, dtype = np.int32) * 256
+  for start, rows in row_chunks(data, keylength, mappings):
+    # Column j counts into bins [256 j, 256 (j+1))
+    idx = rows + offsets[:rows.shape[1]]
+    histograms += np.bincount(idx.ravel(), minlength = keylength * 256)
+  return histograms.reshape(keylength, 256)
+
+'''
+Returns keylength x 256 array where [j, key] is the score of key byte key for column j
+'''
+def column_key_scores(data, keylength, score_set, mappings = ()):
+  return column_histograms(data, keylength, mappings) @ key_score_matrix(byte_weights(score_set))
+
+'''
+Returns most likely key of length keylength, ties broken towards the larger byte (as in challenge3)
+'''
+def best_key(data, keylength, score_set, mappings = ()):
+  scores = column_key_scores(data, keylength, score_set, mappings)
+  return bytes((255 - np.argmax(scores[:, ::-1], axis = 1)).astype(np.uint8))
+
+'''
+Writes data XOR (key repeated) into out, row run by row run
+'''
+def xor_into(data, key, out, mappings = ()):
+  key_arr = np.frombuffer(key, dtype = np.uint8)
+  for start, rows in row_chunks(data, len(key), mappings):
+    out_rows = out[start : start + rows.size].reshape(rows.shape)
+    np.bitwise_xor(rows, key_arr[:rows.shape[1]], out = out_rows)
+
+'''
+Returns most likely key length, detected by coincidence counting on the start of the file
+Under 4 bytes there is no length >= 2 with two full periods to compare, so the key is taken as a single byte
+'''
+def detect_keylength(data):
+  sample = np.asarray(data[:sample_bytes])
+  ub = min(max_keylength, len(sample) // 2)
+  if ub < 2:
+    return 1
+  return coincidence.rank_keylengths(sample.tobytes(), 2, ub)[0][1]
+
+'''
+Breaks repeating-key XOR on file in_filename and writes the decryption to out_filename
+Returns the key
+'''
+def break_file(in_filename, out_filename, score_set, keylength = None):
+  if os.path.getsize(in_filename) == 0:
+    open(out_filename, 'wb').close()
+    return b""
+  in_mm, data = map_file(in_filename)
+  if keylength is None:
+    keylength = detect_keylength(data)
+  key = best_key(data, keylength, score_set, [in_mm])
+  out_mm, out = map_file(out_filename, len(data))
+  xor_into(data, key, out, [in_mm, out_mm])
+  out_mm.flush()
+  del data, out
+  in_mm.close()
+  out_mm.close()
+  return key
+
+def main(argv):
+  keylength = int(argv[3]) if len(argv) >= 4 else None
+  key = break_file(argv[1], argv[2], ascii_letterspaces, keylength)
+  print("Best key of length {0}: {1}".format(len(key), key))
+  print("Decoded bytes written to {0}".format(argv[2]))
+  print()
+
+if __name__ == "__main__":
+  if len(sys.argv) >= 3:
+    main(sys.argv)
+  else:
+    print("Usage: python3 xor_breaker.py <ciphertext file> <output file> <Optional: key length. Default = detect>")
@@ -0,0 +1,145 @@
+'''
+Streaming, multi-core single-byte XOR detector for huge files of hex lines (See challenge4)
+
+The file is read in chunks of lines, so memory stays constant as the file grows
+Each chunk is scored at once: an N x 256 histogram matrix (one row per line) times the
+256 x 256 permuted weight table gives the score of every key for every line
+Chunks are fanned out to a process pool and merged into a bounded top-k heap of (score, line number, key)
+
+To run: python3 xor_detect.py <filename> <Optional: top k. Default = 1> <Optional: workers. Default = all cores>
+'''
+
+import binascii
+import heapq
+import os
+import sys
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from challenge_util import *
+
+chunk_lines = 1 << 16
+max_pending_per_worker = 2 # Bounds how many chunks are in flight, hence memory
+
+'''
+Returns 256 x 256 array T where T[c, key] is the score of plaintext byte c ^ key
+'''
+def key_score_matrix(weights):
+  weights = np.asarray(weights, dtype = np.float64)
+  c = np.arange(256)
+  return weights[c[:, None] ^ c[None, :]]
+
+'''
+Given hex lines, returns N x 256 histogram matrix of their decoded bytes
+'''
+def histogram_matrix(lines):
+  decoded = [binascii.unhexlify(line) for line in lines]
+  lengths = np.fromiter((len(x) for x in decoded), dtype = np.int64, count = len(decoded))
+  data = np.frombuffer(b"".join(decoded), dtype = np.uint8)
+  rows = np.repeat(np.arange(len(decoded), dtype = np.int64), lengths)
+  return np.bincount(rows * 256 + data, minlength = len(decoded) * 256).reshape(len(decoded), 256)
+
+'''
+Returns the top_k (score, line number, key) of a chunk of lines
+Ties are broken towards the later line and larger key (as in challenge4)
+'''
+def score_chunk(table, first_line, lines, top_k):
+  if len(lines) == 0:
+    return []
+  scores = histogram_matrix(lines) @ table
+  best_keys = 255 - np.argmax(scores[:, ::-1], axis = 1)
+  best_scores = scores[np.arange(len(lines)), best_keys]
+  order = np.lexsort((np.arange(len(lines)), best_scores))[-top_k:]
+  return [(best_scores[i].item(), first_line + i.item(), best_keys[i].item()) for i in order]
+
+# Per-process table, set once by the pool initializer instead of being shipped with every chunk
+_worker_table = None
+
+def _init_worker(weights):
+  global _worker_table
+  _worker_table = key_score_matrix(weights)
+
+def _score_chunk_worker(first_line, lines, top_k):
+  return score_chunk(_worker_table, first_line, lines, top_k)
+
+'''
+Yields (first line number, [hex line, ...]) chunks; blank lines keep their line numbers but are skipped
+Line numbers are 1-based
+'''
+def read_chunks(filename, chunk_size = chunk_lines):
+  with open(filename, 'rb') as fin:
+    line_no = 0
+    first_line = 1
+    lines = []
+    line_nos = []
+    for line in fin:
+      line_no += 1
+      line = line.strip()
+      if len(line) == 0:
+        continue
+      if len(lines) == 0:
+        first_line = line_no
+      if line_no - first_line != len(lines):
+        # Blank line inside chunk: flush so line numbers stay contiguous
+        yield first_line, lines
+        lines = []
+        first_line = line_no
+      lines.append(line)
+      if len(lines) == chunk_size:
+        yield first_line, lines
+        lines = []
+    if len(lines) != 0:
+      yield first_line, lines
+
+def _merge(heap, results, top_k):
+  for item in results:
+    if len(heap) < top_k:
+      heapq.heappush(heap, item)
+    else:
+      heapq.heappushpop(heap, item)
+
+'''
+Returns the top_k [(score, line number, key), ...] from best to worst over every line of filename
+workers = None uses every core; workers = 0 scores in this process
+'''
+def detect(filename, score_set, top_k = 1, workers = None, chunk_size = chunk_lines):
+  weights = byte_weights(score_set)
+  heap = []
+  if workers == 0:
+    table = key_score_matrix(weights)
+    for first_line, lines in read_chunks(filename, chunk_size):
+      _merge(heap, score_chunk(table, first_line, lines, top_k), top_k)
+    return sorted(heap, reverse = True)
+
+  workers = workers or os.cpu_count()
+  with ProcessPoolExecutor(workers, initializer = _init_worker, initargs = (weights,)) as pool:
+    pending = deque()
+    for first_line, lines in read_chunks(filename, chunk_size):
+      pending.append(pool.submit(_score_chunk_worker, first_line, lines, top_k))
+      if len(pending) >= workers * max_pending_per_worker:
+        _merge(heap, pending.popleft().result(), top_k)
+    while len(pending) != 0:
+      _merge(heap, pending.popleft().result(), top_k)
+  return sorted(heap, reverse = True)
+
+'''
+Returns the decryption of line line_no (1-based) of filename under single-byte key
+'''
+def decode_line(filename, line_no, key):
+  with open(filename, 'rb') as fin:
+    for i, line in enumerate(fin):
+      if i + 1 == line_no:
+        return repeated_xor(bytes([key]), binascii.unhexlify(line.strip()))
+
+def main(argv):
+  top_k = int(argv[2]) if len(argv) >= 3 else 1
+  workers = int(argv[3]) if len(argv) >= 4 else None
+  for score, line_no, key in detect(argv[1], ascii_letterspaces, top_k, workers):
+    print("Line {0} with score of {1} under key {2}: {3}".format(line_no, score, key, decode_line(argv[1], line_no, key)))
+  print()
+
+if __name__ == "__main__":
+  if len(sys.argv) >= 2:
+    main(sys.argv)
+  else:
+    print("Usage: python3 xor_detect.py <filename> <Optional: top k. Default = 1> <Optional: workers. Default = all cores>")